@@ -0,0 +1,147 @@
+"""
+Scrap benchmark
+
+Runs Scrapper.scrap against a local replay of the site (see replay_server.py)
+and reports, for each number of ads, the ads scrapped per second, the time
+spent in each stage of the scrap and the peak memory.
+
+The stages are: fetch (requests, including throttling and retries), parse
+(lxml parsing and extraction of the parts of the pages), record (conversion
+of the ads into records) and frame (assembly of the DataFrame). Stages running
+on several threads add up the time of all of them, so they can exceed the
+wall time.
+
+Usage:
+    python benchmarks/bench_scrap.py [--sizes 100 1000 10000] [--workers 8]
+        [--prefetch 2] [--latency 0.02] [--error-rate 0.01] [--memory]
+        [--recordings DIR | --site-url URL]
+"""
+
+import argparse
+import functools
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from elnortescrapper import Scrapper
+import elnortescrapper.scrapper as scrapper_module
+
+from replay_server import RecordedSite, ReplayServer, SyntheticSite
+
+STAGES = OrderedDict([
+    ('fetch', ['_request_helper']),
+    ('parse', ['_ads_listed_in_a_page', '_ad_from_tree']),
+    ('record', ['_ad_to_record']),
+    ('frame', ['_records_to_dataframe']),
+])
+
+
+class StageTimer():
+    """Adds up the time spent in the methods of each stage of a Scrapper."""
+
+    def __init__(self, scrapper):
+        self.seconds = OrderedDict((stage, 0.0) for stage in STAGES)
+        self._lock = threading.Lock()
+        for stage, methods in STAGES.items():
+            for name in methods:
+                setattr(scrapper, name,
+                        self._timed(stage, getattr(scrapper, name)))
+
+    def _timed(self, stage, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.seconds[stage] += elapsed
+        return wrapper
+
+
+def run(site_url, ads, args):
+    scrapper = Scrapper(workers=args.workers, prefetch_pages=args.prefetch,
+                        max_requests_per_second=None, site_url=site_url)
+    timer = StageTimer(scrapper)
+    # _parse_page is a function of the module, time it as part of parse
+    parse_page = scrapper_module._parse_page
+    scrapper_module._parse_page = timer._timed('parse', parse_page)
+    if args.memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        df = scrapper.scrap('venta_casas_cdmx', ad_limit=ads)
+        wall = time.perf_counter() - start
+    finally:
+        scrapper_module._parse_page = parse_page
+    peak = None
+    if args.memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return len(df), wall, timer.seconds, peak, scrapper.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 10000])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--prefetch', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds of latency of every request')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='probability of a 503 answer')
+    parser.add_argument('--memory', action='store_true',
+                        help='measure peak memory with tracemalloc, which '
+                             'slows down the scrap')
+    parser.add_argument('--recordings',
+                        help='directory of recorded pages to replay')
+    parser.add_argument('--site-url',
+                        help='use an already running replay server')
+    args = parser.parse_args()
+
+    server = None
+    if args.site_url:
+        site_url = args.site_url
+    else:
+        if args.recordings:
+            site = RecordedSite(args.recordings)
+        else:
+            site = SyntheticSite(total_ads=max(args.sizes))
+        server = ReplayServer(site, latency=args.latency,
+                              error_rate=args.error_rate).start()
+        site_url = server.url
+
+    results = []
+    try:
+        for ads in args.sizes:
+            results.append((ads,) + run(site_url, ads, args))
+    finally:
+        if server is not None:
+            server.stop()
+
+    print()
+    print('%8s %8s %9s %9s %9s %9s %9s %9s %10s' %
+          ('ads', 'scrapped', 'wall (s)', 'ads/s', 'fetch', 'parse',
+           'record', 'frame', 'peak (MB)'))
+    for ads, scrapped, wall, seconds, peak, stats in results:
+        print('%8d %8d %9.2f %9.1f %9.2f %9.2f %9.2f %9.2f %10s' %
+              (ads, scrapped, wall, scrapped / wall, seconds['fetch'],
+               seconds['parse'], seconds['record'], seconds['frame'],
+               '%.1f' % (peak / 2 ** 20) if peak is not None else '-'))
+
+    print()
+    print('%8s %9s %9s %9s %9s %14s' %
+          ('ads', 'requests', 'retries', 'errors', 'MB', 'p95 req (ms)'))
+    for ads, scrapped, wall, seconds, peak, stats in results:
+        counters = stats.counters
+        print('%8d %9d %9d %9d %9.1f %14.0f' %
+              (ads, counters['requests'], counters['retries'],
+               counters['errors'], counters['bytes'] / 2 ** 20,
+               stats.histograms['request_seconds'].quantile(0.95) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Frame assembly benchmark
+
+Compares building the DataFrame of the scrapped ads by appending 1-row
+DataFrames one by one (the way Scrapper.scrap used to do it) with
+accumulating records and building the DataFrame once. No requests are made.
+
+Usage:
+    python benchmarks/frame_assembly.py [max_ads]
+"""
+
+import sys
+import time
+
+from pandas import DataFrame, concat
+
+from elnortescrapper import Scrapper
+
+from parse_ad import SAMPLE_AD
+
+
+def append_one_by_one(records):
+    final_df = DataFrame()
+    for record in records:
+        single_ad = DataFrame(record, index=[record['timestamp']])
+        final_df = concat([final_df, single_ad])
+    return final_df
+
+
+def build_once(scrapper, records):
+    return scrapper._records_to_dataframe(records)
+
+
+def main(max_ads):
+    scrapper = Scrapper()
+    print('%8s %14s %14s' % ('ads', 'append (s)', 'records (s)'))
+    n = 500
+    while n <= max_ads:
+        records = [scrapper._ad_to_record(SAMPLE_AD, 'venta_casas_cdmx')
+                   for _ in range(n)]
+
+        start = time.perf_counter()
+        append_one_by_one(records)
+        append_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_once(scrapper, records)
+        records_time = time.perf_counter() - start
+
+        print('%8d %14.3f %14.3f' % (n, append_time, records_time))
+        n *= 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16000)
@@ -0,0 +1,75 @@
+"""
+Ad parsing benchmark
+
+Measures the time it takes to convert the text of an ad into a record with
+the parsers of elnortescrapper.parsers, compared with searching each field
+with its own re.search() call over the whole ad, the way the ads were parsed
+before. No requests are made.
+
+Usage:
+    python benchmarks/parse_ad.py [repetitions]
+"""
+
+import re
+import sys
+import timeit
+
+from elnortescrapper.parsers import VentaCasasParser
+
+SAMPLE_AD = {
+    'url': 'http://www.avisosdeocasion.com/aviso/123',
+    'text': ('1,234 visitas\n'
+             '$11,800,000 pesos\n'
+             'ZONA: PONIENTE\n'
+             'COLONIA: AILES II\n'
+             'Publicado el domingo 5 de febrero\n'
+             '2 Plantas\n'
+             '450m² de Terreno\n'
+             '4 Recámaras\n'
+             '3.5 Baños\n'
+             '361m² de Construcción\n'),
+    'latitude': '19.3971',
+    'longitude': '-99.2567',
+}
+
+LEGACY_PATTERNS = (
+    ('precio', '\\$([,0-9]+\\s+\\w*)'),
+    ('zona', 'ZONA:\\s+([\\w ]+)'),
+    ('colonia', 'COLONIA:\\s+([\\w ]+)'),
+    ('visitas', '([\\d,]+)\\s+visitas'),
+    ('plantas', '(\\d+)\\s+Planta'),
+    ('m2_terreno', '([\\d.]+)m²\\s+de\\s+Terreno'),
+    ('recámaras', '(\\d+)\\s+Recámara'),
+    ('baños', '([\\d.]+)\\s+Baño'),
+    ('m2_constr', '([\\d.]+)m²\\s+de\\s+Construcción'),
+    ('fecha_pub', 'Publicado[\\s\\w]+( \\d+ de \\w+)\\n'),
+    ('latitude', 'latitude=([\\d+-.]+)\\n'),
+    ('longitude', 'longitude=([\\d+-.]+)\\n'),
+    ('url', '(http.+)\\n'),
+)
+
+
+def legacy_parse(ad):
+    """Concatenates the ad into a string and searches every field in it."""
+    ad_as_string = (ad['url'] + '\n' + ad['text'] +
+                    'latitude=' + ad['latitude'] + '\n' +
+                    'longitude=' + ad['longitude'] + '\n')
+    record = {}
+    for field, pattern in LEGACY_PATTERNS:
+        regex_ans = re.search(pattern, ad_as_string)
+        record[field] = regex_ans.group(1) if regex_ans else None
+    return record
+
+
+def main(repetitions):
+    parser = VentaCasasParser()
+    legacy = timeit.timeit(lambda: legacy_parse(SAMPLE_AD),
+                           number=repetitions)
+    single_pass = timeit.timeit(lambda: parser.parse(SAMPLE_AD),
+                                number=repetitions)
+    print('legacy:      %8.2f us/ad' % (legacy / repetitions * 1e6))
+    print('single pass: %8.2f us/ad' % (single_pass / repetitions * 1e6))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,293 @@
+"""
+Replay server
+
+Local HTTP server that stands in for www.avisosdeocasion.com in the
+benchmarks. It serves either pages recorded from the real site or synthetic
+pages with the same structure, with configurable latency and error
+injection.
+
+Pages are recorded by scrapping through a RecordingTransport:
+
+    >>> from elnortescrapper import Scrapper, Transport
+    >>> from replay_server import RecordingTransport
+    >>> transport = RecordingTransport(Transport(), 'recordings')
+    >>> Scrapper(transport=transport).scrap('venta_casas_cdmx', ad_limit=200)
+
+Usage:
+    python benchmarks/replay_server.py [--port 8000] [--recordings DIR]
+        [--ads 1000] [--latency 0.05] [--error-rate 0.01]
+"""
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+SITE_URL = 'http://www.avisosdeocasion.com'
+
+LISTING_PATH = '/Resultados-Inmuebles.aspx'
+AD_PATH = '/Inmuebles/Aviso.aspx'
+
+LISTING_PAGE = '''<html><head><meta charset="utf-8"></head><body>
+<div id="celda_rut1">{message}</div>
+<table><tr><td class="ar12gris ar12grisb">{ads}</td></tr></table>
+</body></html>'''
+
+LISTED_AD = '''<div class="aviso">
+<a href="{url}"><img src="/foto/{ad_id}.jpg"></a>
+<a href="{url}">Casa en venta en {colonia}</a>
+<span>${precio:,} pesos</span> <span>{recamaras} Recámaras</span>
+</div><div class="publicidad">Anúnciate aquí</div>'''
+
+AD_PAGE = '''<html><head><meta charset="utf-8"></head><body>
+<div id="pestanas"><span>Detalles</span> <span>{visitas:,} visitas</span></div>
+<div id="highlights">${precio:,} pesos
+ZONA: {zona}
+COLONIA: {colonia}</div>
+<table class="ar13gris"><tr><td>Publicado el {dia} de febrero
+</td></tr><tr><td>Estado: Ciudad de México</td></tr></table>
+<table><tr>
+<td class="carac_td">{plantas} Plantas</td>
+<td class="carac_td">{terreno}m² de Terreno</td>
+<td class="carac_td">{recamaras} Recámaras</td>
+<td class="carac_td">{banos} Baños</td>
+<td class="carac_td">{construccion}m² de Construcción</td>
+</tr></table>
+<div id="divMapa"><iframe src="/mapa.aspx?LatitudGM={latitude:.5f}&amp;LongitudGM={longitude:.5f}"></iframe></div>
+</body></html>'''
+
+NO_ADS_PAGE = LISTING_PAGE.format(message='No se encontraron avisos', ads='')
+
+ZONAS = ('CENTRO', 'NORTE', 'SUR', 'ORIENTE', 'PONIENTE')
+COLONIAS = ('AILES II', 'AMPLIACION MIGUEL HI', 'DEL VALLE', 'NARVARTE',
+            'ROMA NORTE', 'CONDESA', 'POLANCO', 'COYOACAN')
+
+
+class SyntheticSite():
+    """Generates pages of ads and pages of single ads with the structure of
+    the real site. Every category has `total_ads` ads, `ads_per_page` per
+    page of ads.
+    """
+
+    def __init__(self, total_ads=1000, ads_per_page=20):
+        self.total_ads = total_ads
+        self.ads_per_page = ads_per_page
+
+    def page(self, path, query, base_url):
+        """Returns the body of the page, or None if it doesn't exist."""
+        if path == LISTING_PATH:
+            return self._listing(int(query['Plaza'][0]),
+                                 int(query['pagina'][0]), base_url)
+        if path == AD_PATH:
+            return self._ad(int(query['plaza'][0]), int(query['id'][0]))
+        return None
+
+    def _listing(self, plaza, page_number, base_url):
+        first = (page_number - 1) * self.ads_per_page
+        last = min(first + self.ads_per_page, self.total_ads)
+        if page_number < 1 or first >= last:
+            return NO_ADS_PAGE
+        ads = []
+        for ad_id in range(first, last):
+            rng = random.Random(plaza * 10 ** 7 + ad_id)
+            ads.append(LISTED_AD.format(
+                url='%s%s?plaza=%d&id=%d' % (base_url, AD_PATH, plaza, ad_id),
+                ad_id=ad_id, colonia=rng.choice(COLONIAS),
+                precio=rng.randrange(500, 20000) * 1000,
+                recamaras=rng.randint(1, 6)))
+        return LISTING_PAGE.format(message='', ads='\n'.join(ads))
+
+    def _ad(self, plaza, ad_id):
+        if not 0 <= ad_id < self.total_ads:
+            return None
+        # Same seed as the listing, so that both show the same ad
+        rng = random.Random(plaza * 10 ** 7 + ad_id)
+        colonia = rng.choice(COLONIAS)
+        precio = rng.randrange(500, 20000) * 1000
+        recamaras = rng.randint(1, 6)
+        return AD_PAGE.format(
+            colonia=colonia, precio=precio, recamaras=recamaras,
+            visitas=rng.randrange(10, 20000), zona=rng.choice(ZONAS),
+            dia=rng.randint(1, 28), plantas=rng.randint(1, 3),
+            terreno=rng.randrange(90, 1000), banos=rng.choice((1, 1.5, 2, 3)),
+            construccion=rng.randrange(60, 800),
+            latitude=19.2 + rng.random() * 0.4,
+            longitude=-99.3 + rng.random() * 0.4)
+
+
+class RecordedSite():
+    """Serves the pages saved by a RecordingTransport. The links to the real
+    site in the pages are rewritten to point to the replay server. Pages of
+    ads that were not recorded are served as the page past the last one.
+    """
+
+    def __init__(self, directory):
+        self._directory = directory
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self._manifest = json.load(f)
+
+    def page(self, path, query, base_url):
+        """Returns the body of the page, or None if it doesn't exist."""
+        key = _key(path, query)
+        if key not in self._manifest:
+            return NO_ADS_PAGE if path == LISTING_PATH else None
+        file_name = self._manifest[key]
+        with open(os.path.join(self._directory, file_name), 'rb') as f:
+            body = f.read().decode('utf-8', 'replace')
+        return body.replace(SITE_URL, base_url)
+
+
+def _key(path, query):
+    """Key of a page in the manifest: its path and its sorted query."""
+    return path + '?' + '&'.join(
+        '%s=%s' % (name, value)
+        for name in sorted(query) for value in query[name])
+
+
+class RecordingTransport():
+    """Wraps a transport and saves every page it fetches into a directory,
+    along with the manifest.json that RecordedSite needs to replay them.
+    """
+
+    def __init__(self, transport, directory):
+        self._transport = transport
+        self._directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, 'manifest.json')
+        self._manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+
+    def get(self, url, headers=None):
+        response = self._transport.get(url, headers)
+        parts = urlsplit(url)
+        key = _key(parts.path, parse_qs(parts.query))
+        file_name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.html'
+        with open(os.path.join(self._directory, file_name), 'wb') as f:
+            f.write(response.text.encode('utf-8'))
+        with self._lock:
+            self._manifest[key] = file_name
+            with open(self._manifest_path, 'w') as f:
+                json.dump(self._manifest, f, indent=1)
+        return response
+
+
+class ReplayServer():
+    """Threaded HTTP server serving a SyntheticSite or a RecordedSite.
+
+    Attributes:
+        url (str): Scheme, host and port of the server, to be given to the
+            Scrapper as site_url.
+        requests (int): Number of requests served.
+    """
+
+    def __init__(self, site, port=0, latency=0, error_rate=0):
+        """
+        Args:
+            site: SyntheticSite or RecordedSite to serve.
+            port (int): Port of the server. 0 picks a free one.
+            latency (float): Seconds every request is delayed.
+            error_rate (float): Probability of answering a request with a 503
+                error, to exercise the retries of the transport.
+        """
+        self.site = site
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go in separate writes, which with Nagle's
+            # algorithm and delayed ACKs adds ~40 ms to keep-alive requests
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and random.random() < server.error_rate:
+                    self._answer(503, b'', {'Retry-After': '0'})
+                    return
+                parts = urlsplit(self.path)
+                body = server.site.page(parts.path, parse_qs(parts.query),
+                                        server.url)
+                if body is None:
+                    self._answer(404, b'')
+                else:
+                    self._answer(200, body.encode('utf-8'),
+                                 {'Content-Type': 'text/html; charset=utf-8'})
+
+            def _answer(self, status, body, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                                      Handler)
+        self._httpd.daemon_threads = True
+        self.url = 'http://127.0.0.1:%d' % self._httpd.server_port
+        self._thread = None
+
+    def start(self):
+        """Starts serving in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serves in the current thread until stop() is called."""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """Stops the server."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--recordings',
+                        help='directory of recorded pages; synthetic pages '
+                             'are served if not given')
+    parser.add_argument('--ads', type=int, default=1000,
+                        help='ads per category of the synthetic site')
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    if args.recordings:
+        site = RecordedSite(args.recordings)
+    else:
+        site = SyntheticSite(total_ads=args.ads)
+    server = ReplayServer(site, args.port, args.latency, args.error_rate)
+    print('Serving on %s' % server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,10 @@
-from .scrapper import Scrapper
+from .scrapper import Scrapper
+from .transport import Transport, TransportError, PermanentError
+from .cache import ResponseCache
+from .index import AdIndex
+from .sinks import CSVSink, JSONLinesSink, ParquetSink
+from .metrics import ScrapperStats
+from .cleaning import clean_ads
+from .archive import Archive
+from .workqueue import WorkQueue, SQLiteWorkQueue
+from .geo import GeoIndex
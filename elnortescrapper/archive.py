@@ -0,0 +1,128 @@
+"""
+Archive
+
+This module implements an append-only archive of the raw pages fetched by the
+Scrapper, so that the ads can be parsed again when the parsers or the website
+change, without fetching them again.
+
+The archive is a file of concatenated gzip members, one per page, like WARC
+files, which makes it a valid gzip file as a whole. Every member has a line
+of JSON with the url, the kind of page ('listing' or 'ad'), the category,
+the time it was fetched and the encoding, followed by the body of the page.
+An index with the same fields plus the offset and length of each member is
+kept next to it in a file of JSON lines with the extension .idx.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+
+
+class Archive():
+    """Append-only archive of pages. It is safe to share it between threads,
+    but only one process should write to it at a time.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path of the archive. It is created if it doesn't
+                exist, and the index is stored at path + '.idx'.
+        """
+        self.path = path
+        self.index_path = path + '.idx'
+        self._lock = threading.Lock()
+        # Urls of the archived pages, read from the index when first needed
+        self._urls = None
+        # Make sure both files exist, so that they can be read right away
+        open(self.path, 'ab').close()
+        open(self.index_path, 'a').close()
+
+    def append(self, url, content, encoding=None, kind='ad', category=None):
+        """Adds a page to the archive.
+
+        Args:
+            url (str): The url of the page.
+            content (bytes): The body of the page.
+            encoding (str): The encoding of the body given by the server.
+            kind (str): 'listing' for pages of ads, 'ad' for the page of a
+                single ad.
+            category (str): The name of the category of ads.
+        """
+        entry = {'url': url, 'kind': kind, 'category': category,
+                 'fetched_at': time.time(), 'encoding': encoding}
+        member = gzip.compress(json.dumps(entry).encode('utf-8') + b'\n' +
+                               content, compresslevel=6)
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                entry['offset'] = f.tell()
+                f.write(member)
+            entry['length'] = len(member)
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            if self._urls is not None:
+                self._urls.add(url)
+
+    def __contains__(self, url):
+        """Returns whether there's a page of the url in the archive."""
+        with self._lock:
+            if self._urls is None:
+                self._urls = set(entry['url'] for entry in
+                                 self.entries(latest=False))
+            return url in self._urls
+
+    def entries(self, kind=None, category=None, latest=True):
+        """Returns the entries of the index, in the order they were archived.
+
+        Args:
+            kind (str): Only the entries of this kind of page.
+            category (str): Only the entries of this category.
+            latest (bool): Only the last entry of every url.
+
+        Returns:
+            list: The entries, as dicts with the keys url, kind, category,
+                fetched_at, encoding, offset and length.
+        """
+        entries = []
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line of an interrupted append
+                    continue
+                if kind is not None and entry['kind'] != kind:
+                    continue
+                if category is not None and entry['category'] != category:
+                    continue
+                entries.append(entry)
+        if latest:
+            position = dict((entry['url'], i)
+                            for i, entry in enumerate(entries))
+            entries = [entry for i, entry in enumerate(entries)
+                       if position[entry['url']] == i]
+        return entries
+
+    def read(self, entry, f=None):
+        """Returns the body of the page of an entry.
+
+        Args:
+            entry (dict): The entry, as returned by entries().
+            f (file): The archive opened in binary mode, to read several
+                entries without opening it every time.
+
+        Returns:
+            bytes
+        """
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.read(entry, f)
+        f.seek(entry['offset'])
+        data = gzip.decompress(f.read(entry['length']))
+        return data[data.index(b'\n') + 1:]
+
+    def size(self):
+        """Returns the size in bytes of the archive."""
+        return os.path.getsize(self.path)
@@ -0,0 +1,237 @@
+"""
+Cache
+
+This module implements an on-disk cache of HTTP responses, used by the
+Transport to avoid fetching again the pages that were fetched recently.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+
+class CachedPage():
+    """A response stored in the cache.
+
+    Attributes:
+        url (str): The url of the page.
+        content (bytes): The body of the response.
+        headers (dict): The headers of the response.
+        encoding (str): The encoding of the body given by the server.
+        stored_at (float): Timestamp of the last time the page was fetched or
+            revalidated with the server.
+    """
+
+    def __init__(self, url, content, headers, encoding, stored_at):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding
+        self.stored_at = stored_at
+
+    def age(self):
+        """Returns the seconds since the page was fetched or revalidated."""
+        return time.time() - self.stored_at
+
+    def validators(self):
+        """Returns the headers of a conditional request for the page, built
+        from its ETag and Last-Modified headers.
+        """
+        headers = {}
+        if 'ETag' in self.headers:
+            headers['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+    def to_response(self):
+        """Returns the page as a requests Response."""
+        response = Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response._content = self.content
+        response.from_cache = True
+        return response
+
+
+class ResponseCache():
+    """Cache of responses stored in a directory, one zlib compressed file per
+    url.
+
+    A page is fresh during `ttl` seconds after it is fetched; after that the
+    Transport revalidates it with a conditional request if the server sent an
+    ETag or Last-Modified header, or fetches it again otherwise. Pages not
+    fetched nor revalidated in `max_age` seconds are removed, and so are the
+    least recently used pages when the size of the cache goes over `max_size`
+    bytes, until it is down to `low_water` times `max_size`, so that the
+    cache is not scanned again on the next page stored.
+    """
+
+    # Headers worth keeping: the ones needed to decode the body and to
+    # revalidate it
+    kept_headers = ('Content-Type', 'ETag', 'Last-Modified')
+
+    low_water = 0.9
+
+    def __init__(self, directory, ttl=3600, max_age=None, max_size=None):
+        """
+        Args:
+            directory (str): Directory of the cache. It is created if it
+                doesn't exist.
+            ttl (float): Seconds during which a page is used without asking
+                the server.
+            max_age (float): Seconds after which a page is removed. None
+                means that pages are never removed because of their age.
+            max_size (int): Maximum size in bytes of the cache. None means no
+                limit.
+        """
+        self._directory = directory
+        self.ttl = ttl
+        self._max_age = max_age
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._eviction_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._paths())
+
+    def _paths(self):
+        return [os.path.join(self._directory, name)
+                for name in os.listdir(self._directory)
+                if name.endswith('.page')]
+
+    def _path(self, url):
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest() + '.page'
+        return os.path.join(self._directory, name)
+
+    def get(self, url):
+        """Returns the cached page of the url, or None if it is not in the
+        cache or it is older than max_age.
+
+        Args:
+            url (str): The url of the page.
+
+        Returns:
+            CachedPage
+        """
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as f:
+                metadata = json.loads(f.readline().decode('utf-8'))
+                content = zlib.decompress(f.read())
+        except (OSError, ValueError, zlib.error):
+            return None
+        page = CachedPage(url, content, metadata['headers'],
+                          metadata['encoding'], metadata['stored_at'])
+        if self._max_age is not None and page.age() > self._max_age:
+            self._remove(path)
+            return None
+        # Mark it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return page
+
+    def put(self, url, response):
+        """Stores the response of the url in the cache.
+
+        Args:
+            url (str): The requested url.
+            response (requests.models.Response): The response of the server.
+        """
+        headers = dict((name, response.headers[name])
+                       for name in self.kept_headers
+                       if name in response.headers)
+        self._write(CachedPage(url, response.content, headers,
+                               response.encoding, time.time()))
+
+    def touch(self, page):
+        """Marks a cached page as just revalidated with the server.
+
+        Args:
+            page (CachedPage): The page, as returned by get().
+        """
+        page.stored_at = time.time()
+        self._write(page)
+
+    def _write(self, page):
+        metadata = {'url': page.url, 'headers': page.headers,
+                    'encoding': page.encoding, 'stored_at': page.stored_at}
+        data = (json.dumps(metadata).encode('utf-8') + b'\n' +
+                zlib.compress(page.content))
+        path = self._path(page.url)
+        # Write to a temporary file and rename it, so that readers never see
+        # a page half written
+        temporary_path = '%s.%s.tmp' % (path, threading.get_ident())
+        with open(temporary_path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(temporary_path, path)
+            self._size += len(data)
+        if self._max_size is not None and self._size > self._max_size:
+            self.evict()
+
+    def _remove(self, path):
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            self._size -= size
+
+    def evict(self):
+        """Removes the pages older than max_age and then the least recently
+        used pages until the cache fits in low_water times max_size. If
+        another thread is already evicting pages it returns straight away.
+        """
+        if not self._eviction_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            for path in self._paths():
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+            entries.sort()
+            if self._max_size is not None:
+                target_size = self._max_size * self.low_water
+            for _, path in entries:
+                if (self._max_age is not None and
+                        self._age_of(path) > self._max_age):
+                    self._remove(path)
+                elif (self._max_size is not None and
+                        self._size > target_size):
+                    self._remove(path)
+                elif self._max_age is None:
+                    # Only the pages over the size were left to remove
+                    break
+        finally:
+            self._eviction_lock.release()
+
+    def _age_of(self, path):
+        """Returns the age in seconds of the page stored in the given file."""
+        try:
+            with open(path, 'rb') as f:
+                metadata = json.loads(f.readline().decode('utf-8'))
+        except (OSError, ValueError):
+            return 0
+        return time.time() - metadata['stored_at']
+
+    def clear(self):
+        """Removes all the pages of the cache."""
+        for path in self._paths():
+            self._remove(path)
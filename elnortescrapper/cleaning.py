@@ -0,0 +1,134 @@
+"""
+Cleaning
+
+This module implements the conversion of the DataFrames of scrapped ads, where
+every column is a string as shown in the website, into typed columns:
+numbers, categories and dates. Every column is converted at once for all the
+ads.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+MONTHS = {'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5,
+          'junio': 6, 'julio': 7, 'agosto': 8, 'septiembre': 9,
+          'setiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12}
+
+# Column name and dtype of the numeric columns
+NUMERIC_COLUMNS = (('visitas', 'Int32'), ('plantas', 'Int8'),
+                   ('recámaras', 'Int8'), ('baños', 'float32'),
+                   ('m2_terreno', 'float32'), ('m2_constr', 'float32'),
+                   ('latitude', 'float64'), ('longitude', 'float64'))
+
+CATEGORICAL_COLUMNS = ('category', 'zona', 'colonia', 'moneda')
+
+
+def _to_number(column):
+    """Converts a column of strings like '1,234' into floats, with NaN where
+    the value is missing or not a number.
+    """
+    return pd.to_numeric(column.astype('string').str.replace(',', '',
+                                                             regex=False),
+                         errors='coerce')
+
+
+def _publication_dates(fecha_pub, timestamps):
+    """Converts dates like ' 5 de febrero' into datetimes. The website
+    doesn't show the year, so it is the last year, up to the year of the
+    scrap, in which the date exists and isn't later than the scrap, e.g. the
+    year before for a date later than the scrap, or the last leap year for
+    ' 29 de febrero'.
+
+    Args:
+        fecha_pub (pandas.Series): The publication dates as strings.
+        timestamps (pandas.Series): The datetimes when the ads were scrapped.
+
+    Returns:
+        pandas.Series: The publication dates as datetimes.
+    """
+    # By position, the index of timestamps may have duplicates
+    parts = fecha_pub.astype('string').reset_index(drop=True).str.extract(
+        r'(\d+)\s+de\s+(\w+)')
+    day = pd.to_numeric(parts[0], errors='coerce')
+    month = parts[1].str.lower().map(MONTHS)
+    timestamps = timestamps.reset_index(drop=True)
+    year = timestamps.dt.year
+    dates = pd.Series(pd.NaT, index=day.index, dtype='datetime64[ns]')
+    pending = day.notna() & month.notna()
+    # A leap day is at most 8 years back, e.g. from 2100 back to 2096
+    for years_back in range(9):
+        if not pending.any():
+            break
+        candidates = pd.to_datetime(pd.DataFrame({
+            'year': year[pending] - years_back, 'month': month[pending],
+            'day': day[pending]}), errors='coerce')
+        found = candidates.notna() & (candidates <= timestamps[pending])
+        found = found[found].index
+        dates[found] = candidates[found]
+        pending[found] = False
+    dates.index = fecha_pub.index
+    return dates
+
+
+def clean_ads(df):
+    """Returns a copy of a DataFrame of scrapped ads with typed columns:
+
+    * precio as a float, with its currency in a new 'moneda' column.
+    * visitas, plantas, recámaras, baños, m2_terreno, m2_constr, latitude
+      and longitude as numbers (nullable integers or floats).
+    * category, zona, colonia and moneda as categoricals.
+    * fecha_pub and the timestamp index as datetimes.
+
+    Columns that are not in the DataFrame are ignored, so it works with the
+    ads of any category.
+
+    Example:
+        >>> df = clean_ads(my_scrapper.scrap('venta_casas_cdmx'))
+        >>> df.groupby('colonia', observed=True)['precio'].median()
+
+    Args:
+        df (pandas.core.frame.DataFrame): The ads, as returned by
+            Scrapper.scrap().
+
+    Returns:
+        pandas.core.frame.DataFrame
+    """
+    df = df.copy()
+    if not len(df):
+        return df
+
+    if df.index.name == 'timestamp':
+        df.index = pd.to_datetime(df.index)
+        timestamps = pd.Series(df.index, index=df.index)
+    else:
+        timestamps = pd.Series(pd.Timestamp.now(), index=df.index)
+
+    if 'precio' in df.columns:
+        parts = df['precio'].astype('string').str.extract(
+            r'([\d,.]+)\s*(\w*)')
+        df['precio'] = _to_number(parts[0]).astype('float64')
+        position = df.columns.get_loc('precio') + 1
+        moneda = parts[1].str.lower()
+        df.insert(position, 'moneda', moneda.mask(moneda == ''))
+
+    for column, dtype in NUMERIC_COLUMNS:
+        if column in df.columns:
+            values = _to_number(df[column])
+            if dtype.startswith('Int'):
+                # Nullable integers don't take non integer values, and
+                # astype wraps around the ones out of the range of the dtype
+                limits = np.iinfo(dtype.lower())
+                values = values.where((values == values.round()) &
+                                      values.between(limits.min, limits.max))
+            df[column] = values.astype(dtype)
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('string').str.strip().astype(
+                'category')
+
+    if 'fecha_pub' in df.columns:
+        df['fecha_pub'] = _publication_dates(df['fecha_pub'], timestamps)
+
+    return df
@@ -0,0 +1,245 @@
+"""
+Geo
+
+This module implements a spatial index of scrapped ads, for queries like the
+ads within 2 km of a point or within a bounding box, and aggregations by
+colonia of the ads in an area, without scanning and converting the whole
+DataFrame on every query.
+
+The ads are bucketed in a grid of cells of `cell_size` degrees, stored as
+arrays sorted by cell, so a query only looks at the ads of the cells that
+overlap its area.
+"""
+
+import math
+import pickle
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from .cleaning import clean_ads
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Returns the great-circle distances in km from a point to an array of
+    points.
+
+    Args:
+        lat (float): Latitude of the point in degrees.
+        lon (float): Longitude of the point in degrees.
+        lats (numpy.ndarray): Latitudes of the points in degrees.
+        lons (numpy.ndarray): Longitudes of the points in degrees.
+
+    Returns:
+        numpy.ndarray
+    """
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (np.sin((lats - lat) / 2) ** 2 +
+         math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class GeoIndex():
+    """Grid index of the location of the ads of a DataFrame.
+
+    Example:
+        >>> index = GeoIndex(my_scrapper.scrap('venta_casas_cdmx'))
+        >>> index.within_radius(19.4326, -99.1332, 2)[['precio', 'colonia',
+        ...                                            'distance_km']]
+        >>> index.aggregate(lat=19.4326, lon=-99.1332, radius_km=2)
+        >>> index.save('venta_casas_cdmx.geo')
+        >>> index = GeoIndex.load('venta_casas_cdmx.geo')
+
+    Attributes:
+        ads (pandas.core.frame.DataFrame): The ads with a location, with
+            typed columns.
+    """
+
+    def __init__(self, df, cell_size=0.01):
+        """
+        Args:
+            df (pandas.core.frame.DataFrame): The ads, as returned by
+                Scrapper.scrap(). They are converted with clean_ads() unless
+                their coordinates already are numbers. Ads without location
+                are left out.
+            cell_size (float): Size of the cells of the grid in degrees.
+                0.01 is about 1.1 km.
+        """
+        if not len(df):
+            df = pd.DataFrame(columns=['latitude', 'longitude'],
+                              dtype='float64')
+        elif not (is_numeric_dtype(df['latitude']) and
+                  is_numeric_dtype(df['longitude'])):
+            df = clean_ads(df)
+        df = df[df['latitude'].notna() & df['longitude'].notna()]
+
+        self.cell_size = cell_size
+        rows = self._cells(df['latitude'].to_numpy('float64'),
+                           df['longitude'].to_numpy('float64'))
+        # Sort the ads by cell, so that the ads of a cell are contiguous
+        order = np.lexsort((rows[1], rows[0]))
+        self.ads = df.iloc[order]
+        self._lats = self.ads['latitude'].to_numpy('float64')
+        self._lons = self.ads['longitude'].to_numpy('float64')
+        # Key of the cell of every ad, in the same order as the ads, and the
+        # position of the first ad of every occupied cell, plus the end
+        keys = self._keys(rows[0][order], rows[1][order])
+        self._cell_keys, starts = np.unique(keys, return_index=True)
+        self._cell_starts = np.append(starts, len(keys))
+        self._aggregates = {}
+
+    def __len__(self):
+        return len(self.ads)
+
+    def _cells(self, lats, lons):
+        """Returns the rows and columns of the cells of the coordinates."""
+        return (np.floor(lats / self.cell_size).astype('int64'),
+                np.floor(lons / self.cell_size).astype('int64'))
+
+    def _keys(self, rows, columns):
+        """Returns keys of cells that sort like their rows and columns."""
+        return (np.asarray(rows, dtype='int64') << 32) + (
+            np.asarray(columns, dtype='int64') + (1 << 31))
+
+    def _candidates(self, south, west, north, east):
+        """Returns the positions in `ads` of the ads of the cells that
+        overlap the bounding box. The ads of a row of cells of the box are
+        contiguous, so they are found with a binary search per row, whatever
+        the number of empty cells in the box.
+        """
+        first_row, first_column = self._cells(np.float64(south),
+                                              np.float64(west))
+        last_row, last_column = self._cells(np.float64(north),
+                                            np.float64(east))
+        if first_row > last_row or first_column > last_column:
+            return np.empty(0, dtype='int64')
+        rows = np.arange(first_row, last_row + 1)
+        first_cells = np.searchsorted(self._cell_keys,
+                                      self._keys(rows, first_column))
+        last_cells = np.searchsorted(self._cell_keys,
+                                     self._keys(rows, last_column),
+                                     side='right')
+        starts = self._cell_starts[first_cells]
+        lengths = self._cell_starts[last_cells] - starts
+        starts, lengths = starts[lengths > 0], lengths[lengths > 0]
+        if not len(lengths):
+            return np.empty(0, dtype='int64')
+        # Concatenation of the ranges of positions of the rows
+        ends = np.cumsum(lengths)
+        return (np.arange(ends[-1]) +
+                np.repeat(starts - ends + lengths, lengths))
+
+    def _in_bbox(self, south, west, north, east):
+        positions = self._candidates(south, west, north, east)
+        lats, lons = self._lats[positions], self._lons[positions]
+        inside = ((lats >= south) & (lats <= north) &
+                  (lons >= west) & (lons <= east))
+        return positions[inside]
+
+    def _in_radius(self, lat, lon, radius_km):
+        dlat = radius_km / KM_PER_DEGREE
+        # Degrees of longitude get shorter towards the poles
+        dlon = radius_km / (KM_PER_DEGREE *
+                            max(math.cos(math.radians(lat)), 1e-6))
+        positions = self._candidates(lat - dlat, lon - dlon,
+                                     lat + dlat, lon + dlon)
+        distances = haversine_km(lat, lon, self._lats[positions],
+                                 self._lons[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return positions[order], distances[order]
+
+    def within_bbox(self, south, west, north, east):
+        """Returns the ads inside a bounding box.
+
+        Args:
+            south (float): Minimum latitude.
+            west (float): Minimum longitude.
+            north (float): Maximum latitude.
+            east (float): Maximum longitude.
+
+        Returns:
+            pandas.core.frame.DataFrame
+        """
+        return self.ads.iloc[self._in_bbox(south, west, north, east)]
+
+    def within_radius(self, lat, lon, radius_km):
+        """Returns the ads within a distance of a point, closest first, with
+        their distance to it in a 'distance_km' column.
+
+        Args:
+            lat (float): Latitude of the point.
+            lon (float): Longitude of the point.
+            radius_km (float): Distance in km.
+
+        Returns:
+            pandas.core.frame.DataFrame
+        """
+        positions, distances = self._in_radius(lat, lon, radius_km)
+        df = self.ads.iloc[positions].copy()
+        df['distance_km'] = distances
+        return df
+
+    def aggregate(self, by='colonia', column='precio', lat=None, lon=None,
+                  radius_km=None, bbox=None):
+        """Returns the count, median, mean, minimum and maximum of a column of
+        the ads by colonia (or any other column), along with the center of
+        their locations. The ads can be limited to the ones within radius_km
+        of lat and lon or within a bbox. The aggregation of all the ads is
+        computed once and kept, and a copy of it is returned.
+
+        Args:
+            by (str): Column to group the ads by.
+            column (str): Numeric column to aggregate.
+            lat (float): Latitude of the center of the area.
+            lon (float): Longitude of the center of the area.
+            radius_km (float): Radius of the area in km.
+            bbox (tuple): South, west, north and east of the area.
+
+        Returns:
+            pandas.core.frame.DataFrame: One row per group, sorted by count.
+        """
+        if radius_km is not None:
+            ads = self.ads.iloc[self._in_radius(lat, lon, radius_km)[0]]
+        elif bbox is not None:
+            ads = self.ads.iloc[self._in_bbox(*bbox)]
+        else:
+            key = (by, column)
+            if key not in self._aggregates:
+                self._aggregates[key] = _aggregate(self.ads, by, column)
+            return self._aggregates[key].copy()
+        return _aggregate(ads, by, column)
+
+    def save(self, path):
+        """Saves the index along with its ads to a file. Load it with
+        GeoIndex.load().
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with save(). Like any pickle, only load files
+        you trust.
+        """
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if not isinstance(index, cls):
+            raise Exception('%s is not a GeoIndex' % path)
+        return index
+
+
+def _aggregate(ads, by, column):
+    """Aggregates a column of the ads by another, see GeoIndex.aggregate()."""
+    groups = ads.groupby(by, observed=True)
+    df = groups[column].agg(['count', 'median', 'mean', 'min', 'max'])
+    df['latitude'] = groups['latitude'].mean()
+    df['longitude'] = groups['longitude'].mean()
+    return df.sort_values('count', ascending=False, kind='stable')
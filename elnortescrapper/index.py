@@ -0,0 +1,151 @@
+"""
+Index
+
+This module implements the persistent index of the ads already scrapped,
+stored in a SQLite database, which allows incremental scraps that only visit
+the new ads of a category and reusing the records of the ads that didn't
+change since they were scrapped.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class AdIndex():
+    """SQLite index of the urls of the scrapped ads of each category, with the
+    first and the last time each ad was seen in the listing of the category.
+    It also keeps the last record of each ad along with the fingerprint of
+    the ad in the listing when it was scrapped.
+    It is safe to share it between threads.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path of the SQLite database. It is created if it
+                doesn't exist.
+        """
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS ads ('
+                'category TEXT NOT NULL, '
+                'url TEXT NOT NULL, '
+                'first_seen REAL NOT NULL, '
+                'last_seen REAL NOT NULL, '
+                'PRIMARY KEY (category, url))')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS records ('
+                'category TEXT NOT NULL, '
+                'url TEXT NOT NULL, '
+                'fingerprint TEXT NOT NULL, '
+                'record TEXT NOT NULL, '
+                'scrapped_at REAL NOT NULL, '
+                'PRIMARY KEY (category, url))')
+
+    def known(self, category, urls):
+        """Returns which of the given urls are in the index.
+
+        Args:
+            category (str): The name of the category of ads.
+            urls (list): The urls of the ads.
+
+        Returns:
+            set: The urls that are in the index.
+        """
+        known_urls = set()
+        urls = list(urls)
+        # SQLite limits the number of parameters of a query
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            query = ('SELECT url FROM ads WHERE category = ? AND url IN (%s)'
+                     % ', '.join('?' * len(chunk)))
+            with self._lock:
+                rows = self._connection.execute(query, [category] + chunk)
+                known_urls.update(row[0] for row in rows)
+        return known_urls
+
+    def add(self, category, urls):
+        """Adds the urls to the index, or updates the time they were last seen
+        if they already are in it.
+
+        Args:
+            category (str): The name of the category of ads.
+            urls (list): The urls of the ads.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT INTO ads (category, url, first_seen, last_seen) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (category, url) '
+                'DO UPDATE SET last_seen = excluded.last_seen',
+                [(category, url, now, now) for url in urls])
+
+    def stored_records(self, category, fingerprints, max_age=None):
+        """Returns the stored records of the ads whose fingerprint didn't
+        change.
+
+        Args:
+            category (str): The name of the category of ads.
+            fingerprints (dict): The current fingerprint of each url.
+            max_age (float): Records scrapped more than this many seconds ago
+                are not returned. None means no limit.
+
+        Returns:
+            dict: The stored record of each url, as an OrderedDict.
+        """
+        min_scrapped_at = time.time() - max_age if max_age else 0
+        records = {}
+        urls = list(fingerprints)
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            query = ('SELECT url, fingerprint, record FROM records '
+                     'WHERE category = ? AND scrapped_at >= ? AND url IN (%s)'
+                     % ', '.join('?' * len(chunk)))
+            with self._lock:
+                rows = self._connection.execute(
+                    query, [category, min_scrapped_at] + chunk).fetchall()
+            for url, fingerprint, record in rows:
+                if fingerprints[url] == fingerprint:
+                    records[url] = json.loads(record,
+                                              object_pairs_hook=OrderedDict)
+        return records
+
+    def store_records(self, category, records):
+        """Stores the records of the ads with their fingerprints, replacing
+        the previous ones.
+
+        Args:
+            category (str): The name of the category of ads.
+            records (list): Tuples of url, fingerprint and record of the ads.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO records '
+                '(category, url, fingerprint, record, scrapped_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(category, url, fingerprint, json.dumps(record), now)
+                 for url, fingerprint, record in records])
+
+    def count(self, category):
+        """Returns the number of ads of the category in the index.
+
+        Args:
+            category (str): The name of the category of ads.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT COUNT(*) FROM ads WHERE category = ?',
+                (category,)).fetchone()
+        return row[0]
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,155 @@
+"""
+Metrics
+
+This module implements the counters and latency histograms that the Scrapper
+and its Transport update while scrapping, so that a slow scrap can be traced
+to the network, the server or the parsing.
+"""
+
+import bisect
+import threading
+from collections import OrderedDict
+
+
+class Histogram():
+    """Histogram of durations in seconds with fixed buckets.
+
+    Attributes:
+        count (int): Number of observed values.
+        sum (float): Sum of the observed values.
+        max (float): Largest observed value.
+    """
+
+    buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+               10, 30, 60)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket of the q-quantile, e.g. 0.95
+        for the 95th percentile, or the largest value if it's in the last
+        bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def to_dict(self):
+        return OrderedDict([('count', self.count), ('sum', self.sum),
+                            ('mean', self.mean), ('p50', self.quantile(0.5)),
+                            ('p95', self.quantile(0.95)), ('max', self.max)])
+
+
+class ScrapperStats():
+    """Counters and histograms of a Scrapper. It is safe to share it between
+    threads.
+
+    Counters:
+        requests: Requests sent to the server, retries included.
+        retries: Requests repeated after a failure.
+        errors: Requests that failed for good.
+        bytes: Bytes of the bodies downloaded.
+        cache_hits: Pages taken from the cache without asking the server.
+        not_modified: Cached pages revalidated with the server.
+        pages: Pages of ads processed.
+        ads: Ads scrapped.
+        reused_ads: Ads whose record was reused from the index.
+        skipped_ads: Ads no longer available.
+
+    Histograms:
+        request_seconds: Duration of every request.
+        parse_seconds: Time to parse the page of an ad and extract its parts.
+        record_seconds: Time to convert an ad into a record.
+
+    Callbacks added with add_callback() are called with the name of the
+    metric, the value added or observed and the kind of metric ('counter' or
+    'histogram'), e.g. to export them to Prometheus or StatsD.
+
+    Example:
+        >>> my_scrapper = Scrapper()
+        >>> df = my_scrapper.scrap('venta_casas_cdmx', ad_limit=100)
+        >>> my_scrapper.stats.counters['requests']
+        106
+        >>> my_scrapper.stats.histograms['request_seconds'].mean
+        0.2341
+    """
+
+    counter_names = ('requests', 'retries', 'errors', 'bytes', 'cache_hits',
+                     'not_modified', 'pages', 'ads', 'reused_ads',
+                     'skipped_ads')
+    histogram_names = ('request_seconds', 'parse_seconds', 'record_seconds')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reset()
+
+    def reset(self):
+        """Sets all the metrics back to zero."""
+        with self._lock:
+            self.counters = OrderedDict((name, 0)
+                                        for name in self.counter_names)
+            self.histograms = OrderedDict((name, Histogram())
+                                          for name in self.histogram_names)
+
+    def add_callback(self, callback):
+        """Registers a function to be called on every update of a metric.
+
+        Args:
+            callback (callable): Function called with the name of the metric,
+                the value and the kind of metric.
+        """
+        self._callbacks.append(callback)
+
+    def increment(self, name, value=1):
+        """Adds value to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for callback in self._callbacks:
+            callback(name, value, 'counter')
+
+    def observe(self, name, value):
+        """Adds a value to a histogram."""
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(value)
+        for callback in self._callbacks:
+            callback(name, value, 'histogram')
+
+    def to_dict(self):
+        """Returns a snapshot of all the metrics."""
+        with self._lock:
+            snapshot = OrderedDict(self.counters)
+            for name, histogram in self.histograms.items():
+                snapshot[name] = histogram.to_dict()
+        return snapshot
+
+    def __repr__(self):
+        lines = ['%s: %s' % (name, value)
+                 for name, value in self.counters.items()]
+        for name, histogram in self.histograms.items():
+            lines.append('%s: count=%d mean=%.4f p95=%s max=%.4f' %
+                         (name, histogram.count, histogram.mean,
+                          histogram.quantile(0.95), histogram.max))
+        return '\n'.join(lines)
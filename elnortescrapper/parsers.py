@@ -0,0 +1,115 @@
+"""
+Parsers
+
+This module implements the parsers that convert the text scrapped from the
+page of an ad into a record, one parser per category of ads.
+"""
+
+import re
+from collections import OrderedDict
+from datetime import datetime
+
+
+# Patterns of the fields found in the text of the ads. Every pattern has a
+# single named group with the value of the field.
+PRECIO = r'\$(?P<precio>[,0-9]+\s+\w*)'
+ZONA = r'ZONA:\s+(?P<zona>[\w ]+)'
+COLONIA = r'COLONIA:\s+(?P<colonia>[\w ]+)'
+VISITAS = r'(?P<visitas>[\d,]+)\s+visitas'
+PLANTAS = r'(?P<plantas>\d+)\s+Planta'
+M2_TERRENO = r'(?P<m2_terreno>[\d.]+)m²\s+de\s+Terreno'
+RECAMARAS = r'(?P<recámaras>\d+)\s+Recámara'
+BANOS = r'(?P<baños>[\d.]+)\s+Baño'
+M2_CONSTR = r'(?P<m2_constr>[\d.]+)m²\s+de\s+Construcción'
+FECHA_PUB = r'Publicado[\s\w]+(?P<fecha_pub> \d+ de \w+)\n'
+
+# The characters at which the first match of a field can start: the first
+# character of the patterns above, except the ones that any pattern matching
+# there also matches at the character before, namely a digit after a digit, a
+# '.' after a digit or a '.', and a ',' after a digit or a ','.
+FIELD_START = r'[$ZCP\d.,](?<!\d\d)(?<![\d.]\.)(?<![\d,],)'
+
+
+class AdParser():
+    """Converts an ad into a record scanning its text once with a single
+    compiled regex that alternates the patterns of all the fields.
+
+    The regex consumes only the character at which a field starts and
+    checks the patterns with a lookahead from it. So a match can't hide an
+    occurrence of another field that overlaps with it, and the first match
+    of every field is its leftmost one, as with a search of each pattern on
+    its own, provided `field_start` skips only characters where no pattern
+    can match first. The patterns of a parser must not match at the same
+    position, which holds as long as each of them requires a different word.
+
+    An ad is a dict with the keys 'url', 'latitude' and 'longitude', which
+    are copied to the record as they are, and 'text', the text of the page of
+    the ad from which the rest of the fields are extracted.
+
+    Subclasses set `patterns` to the patterns of the fields of their category
+    of ads, in the order of the columns of the record, and `field_start` to
+    the characters at which they can start if they are not the ones of
+    FIELD_START.
+    """
+
+    patterns = ()
+    field_start = FIELD_START
+
+    def __init__(self):
+        # The name of the only group of each pattern
+        self._fields = [list(re.compile(pattern).groupindex)[0]
+                        for pattern in self.patterns]
+        # The lookahead inside a lookbehind of the character consumed checks
+        # the patterns from that character
+        self._regex = re.compile(self.field_start + '(?<=(?=' +
+                                 '|'.join(self.patterns) + ').)')
+        self.columns = (['timestamp'] + self._fields +
+                        ['latitude', 'longitude', 'url'])
+
+    def parse(self, ad):
+        """Converts an ad into a record. Missing values of the ad are going to
+        be set as None.
+
+        Args:
+            ad (dict): The ad, as returned by Scrapper._scrap_ad().
+
+        Returns:
+            collections.OrderedDict: The columns of the ad, starting with the
+                timestamp of the moment it was parsed.
+        """
+        record = OrderedDict.fromkeys(self.columns)
+        record['timestamp'] = datetime.now().isoformat()
+        record['latitude'] = ad.get('latitude')
+        record['longitude'] = ad.get('longitude')
+        record['url'] = ad.get('url')
+
+        text = ad['text']
+        missing = set(self._fields)
+        for match in self._regex.finditer(text):
+            field = match.lastgroup
+            if field in missing:
+                record[field] = match.group(field)
+                missing.discard(field)
+                if not missing:
+                    break
+        return record
+
+
+class VentaCasasParser(AdParser):
+    """Parser of the ads of houses for sale."""
+
+    patterns = (PRECIO, ZONA, COLONIA, VISITAS, PLANTAS, M2_TERRENO,
+                RECAMARAS, BANOS, M2_CONSTR, FECHA_PUB)
+
+
+class VentaDepartamentosParser(AdParser):
+    """Parser of the ads of apartments for sale."""
+
+    patterns = (PRECIO, ZONA, COLONIA, VISITAS, RECAMARAS, BANOS, M2_CONSTR,
+                FECHA_PUB)
+
+
+class VentaTerrenosParser(AdParser):
+    """Parser of the ads of land lots for sale."""
+
+    patterns = (PRECIO, ZONA, COLONIA, VISITAS, M2_TERRENO, FECHA_PUB)
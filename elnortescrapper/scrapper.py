@@ -5,16 +5,152 @@ This module implements the Scrapper class, which is a web scrapper for real
 estate classified ads of El Norte Avisos de Ocasión.
 """
 
-import requests
-from lxml import html
-from bs4 import BeautifulSoup
-from pandas import DataFrame
-import random
-import time
-from datetime import datetime
-from collections import OrderedDict
+from lxml import html, etree
+from pandas import DataFrame, concat
+from collections import OrderedDict, deque
 import re
 import logging
+import threading
+import hashlib
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+from .transport import Transport, TransportError, PermanentError
+from .cache import ResponseCache
+from .index import AdIndex
+from .sinks import open_sink
+from .metrics import ScrapperStats
+from .cleaning import clean_ads
+from .archive import Archive
+from .workqueue import LISTING, AD
+from .parsers import (VentaCasasParser, VentaDepartamentosParser,
+                      VentaTerrenosParser)
+
+_LATITUDE = re.compile(r'LatitudGM=([\d+-.]+)')
+_LONGITUDE = re.compile(r'LongitudGM=([\d+-.]+)')
+
+
+def _with_class(tag, css_class):
+    """Returns the XPath of the elements with the given tag and class."""
+    return ('//%s[contains(concat(" ", normalize-space(@class), " "), " %s ")]'
+            % (tag, css_class))
+
+
+# Compiled XPaths of the parts of the pages of ads and of the ads
+_LAST_PAGE_MESSAGE = etree.XPath('//div[@id="celda_rut1"]/text()')
+_ADS_IN_PAGE = etree.XPath(_with_class('td', 'ar12grisb') + '/*')
+_LINKS = etree.XPath('.//a')
+_VISITAS = etree.XPath('//div[@id="pestanas"]')
+_HIGHLIGHTS = etree.XPath('//div[@id="highlights"]')
+_INFO_ROW = etree.XPath('(' + _with_class('table', 'ar13gris') + ')[1]//tr')
+_CARACTERISTICAS = etree.XPath(_with_class('td', 'carac_td'))
+_MAPA = etree.XPath('//div[@id="divMapa"]')
+
+# lxml parsers must not be shared between threads
+_thread_data = threading.local()
+
+
+def _parse_page(page):
+    """Parses a page with lxml straight from its bytes, using the encoding
+    given by the server if there's one, or the one declared in the page
+    otherwise.
+
+    Args:
+        page (requests.models.Response): The page to parse.
+
+    Returns:
+        lxml.html.HtmlElement: The parsed tree of the page.
+    """
+    return _parse_html(page.content, page.encoding)
+
+
+def _parse_html(content, encoding=None):
+    """Parses the bytes of a page with lxml.
+
+    Args:
+        content (bytes): The body of the page.
+        encoding (str): The encoding of the body, or None to use the one
+            declared in the page.
+
+    Returns:
+        lxml.html.HtmlElement: The parsed tree of the page.
+    """
+    parsers = getattr(_thread_data, 'html_parsers', None)
+    if parsers is None:
+        parsers = _thread_data.html_parsers = {}
+    if encoding not in parsers:
+        parsers[encoding] = html.HTMLParser(encoding=encoding)
+    return html.fromstring(content, parser=parsers[encoding])
+
+
+def _extract_ad(ad_url, tree):
+    """Extracts the details of an ad from the parsed page of the ad.
+
+    Args:
+        ad_url (str): The URL of the ad.
+        tree (lxml.html.HtmlElement): The parsed page of the ad.
+
+    Returns:
+        dict: The ad, with its 'url', the 'text' of the parts of the page
+            with its details and its 'latitude' and 'longitude'.
+    """
+    sections = []
+
+    # visitas
+    sections.append(_VISITAS(tree)[0].text_content())
+    # zona, colonia and precio
+    sections.append(_HIGHLIGHTS(tree)[0].text_content())
+    # zona and estado
+    sections.append(_INFO_ROW(tree)[0].text_content())
+    # square meters and more details
+    for td in _CARACTERISTICAS(tree):
+        sections.append(td.text_content())
+
+    ad = {'url': ad_url, 'text': '\n'.join(sections) + '\n',
+          'latitude': None, 'longitude': None}
+    # geolocation
+    for div in _MAPA(tree):
+        div_content = html.tostring(div, encoding='unicode')
+        lat = _LATITUDE.search(div_content)
+        longit = _LONGITUDE.search(div_content)
+        if lat and longit:
+            ad['latitude'] = lat.group(1)
+            ad['longitude'] = longit.group(1)
+    return ad
+
+
+def _reparse_entries(archive_path, entries, parser):
+    """Parses the archived pages of some ads. It runs in the processes of
+    Scrapper.reparse(), so it only takes picklable arguments.
+
+    Args:
+        archive_path (str): Path of the archive.
+        entries (list): Entries of the archive of pages of ads.
+        parser (elnortescrapper.parsers.AdParser): Parser of the category.
+
+    Returns:
+        list: The records of the ads whose page could be parsed, with the
+            time they were fetched as timestamp.
+    """
+    archive = Archive(archive_path)
+    records = []
+    with open(archive_path, 'rb') as f:
+        for entry in entries:
+            tree = _parse_html(archive.read(entry, f), entry['encoding'])
+            try:
+                ad = _extract_ad(entry['url'], tree)
+            except IndexError:
+                logging.debug('Unexpected page of ad: %s', entry['url'])
+                continue
+            record = parser.parse(ad)
+            record['timestamp'] = datetime.fromtimestamp(
+                entry['fetched_at']).isoformat()
+            records.append(record)
+    return records
 
 
 class Scrapper():
@@ -84,176 +220,257 @@ class Scrapper():
         * Support categories venta_departamentos
         * Documentation
         * Demo in iPython Notebooks
-        * Utility methods to clean the data (currency, publication date, etc.)
         * Add tests
     """
 
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, workers=1, max_requests_per_second=2,
+                 transport=None, cache_dir=None, cache_ttl=3600,
+                 index_path=None, prefetch_pages=0, site_url=None,
+                 metrics_callback=None, archive_path=None,
+                 rate_limiter=None, cache_max_size=2 ** 30,
+                 cache_max_age=7 * 24 * 3600):
         """Initialize the URLs of the ad categories and the verbose mode using
         logging package.
+
+        Args:
+            verbose (bool): Show debug messages.
+            workers (int): Number of ad pages fetched and scrapped in
+                parallel. With 1 (the default) ads are visited one at a time.
+            max_requests_per_second (float): Maximum number of requests sent
+                to the same host per second. None means no limit.
+            transport: Object with a get(url) method used to make the
+                requests. By default a Transport with a connection pool of
+                the size of `workers`.
+            cache_dir (str): Directory where the fetched pages are cached.
+                None means no cache. Ignored if a transport is given.
+            cache_ttl (float): Seconds during which a cached page is used
+                without asking the server again.
+            cache_max_size (int): Maximum size in bytes of the cache, 1 GiB by
+                default. The least recently used pages are removed when it
+                is exceeded. None means no limit.
+            cache_max_age (float): Seconds after which a cached page that was
+                not fetched nor revalidated is removed, a week by default.
+                None means no limit.
+            index_path (str): Path of the SQLite database where the scrapped
+                ads are recorded, needed for incremental scraps. None means
+                no index.
+            prefetch_pages (int): Number of pages of ads fetched in the
+                background ahead of the one whose ads are being scrapped.
+                The number of pages of a category is found beforehand with
+                a few probing requests. With 0 (the default) pages are
+                fetched one after the other.
+            site_url (str): Scheme and host to use instead of
+                http://www.avisosdeocasion.com, e.g. to scrap a mirror or a
+                local replay of the site.
+            metrics_callback (callable): Called with the name, the value
+                and the kind of every metric updated in `stats`.
+            archive_path (str): Path of the Archive where the raw pages
+                fetched are kept, to be parsed again with reparse(). None
+                means no archive.
+            rate_limiter: Object with a consume() method waited for before
+                every request, e.g. the rate budget of a WorkQueue shared by
+                several Scrappers. Ignored if a transport is given.
         """
+        self._venta_casas_parser = VentaCasasParser()
+        self._venta_departamentos_parser = VentaDepartamentosParser()
+        self._venta_terrenos_parser = VentaTerrenosParser()
+
         # OrderedDict with
         # key: the name of the category
-        # value: the url of the category and the method that converts an ad of
-        # that category into a DataFrame
+        # value: the url of the category, the method that converts an ad of
+        # that category into a record and the parser behind that method
         self._categories = OrderedDict([
-            ('venta_casas_cdmx', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=1&Plaza=1&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_nuevo_leon', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=2&Plaza=2&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_jalisco', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=3&Plaza=3&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_aguascalientes', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=4&Plaza=4&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_baja_california', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=5&Plaza=5&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_baja_california_sur', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=6&Plaza=6&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_campeche', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=7&Plaza=7&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_chiapas', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=8&Plaza=8&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_chihuahua', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=9&Plaza=9&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_coahuila', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=10&Plaza=10&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_colima', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=11&Plaza=11&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_durango', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=12&Plaza=12&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_edomex', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=13&Plaza=13&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_guanajuato', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=14&Plaza=14&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_guerrero', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=15&Plaza=15&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_hidalgo', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=16&Plaza=16&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_michoacan', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=17&Plaza=17&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_morelos', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=18&Plaza=18&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_nayarit', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=19&Plaza=19&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_oaxaca', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=20&Plaza=20&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_puebla', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=21&Plaza=21&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_queretaro', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=22&Plaza=22&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_quintana_roo', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=23&Plaza=23&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_san_luis', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=24&Plaza=24&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_sinaloa', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=25&Plaza=25&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_sonora', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=26&Plaza=26&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_tabasco', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=27&Plaza=27&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_tamaulipas', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=28&Plaza=28&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_tlaxcala', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=29&Plaza=29&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_veracruz', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=30&Plaza=30&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_yucatan', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=31&Plaza=31&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
-            ('venta_casas_texas', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=34&Plaza=34&pagina=1&idinmueble=3', self._venta_casas_ad_to_df]),
+            ('venta_casas_cdmx', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=1&Plaza=1&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_nuevo_leon', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=2&Plaza=2&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_jalisco', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=3&Plaza=3&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_aguascalientes', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=4&Plaza=4&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_baja_california', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=5&Plaza=5&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_baja_california_sur', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=6&Plaza=6&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_campeche', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=7&Plaza=7&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_chiapas', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=8&Plaza=8&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_chihuahua', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=9&Plaza=9&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_coahuila', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=10&Plaza=10&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_colima', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=11&Plaza=11&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_durango', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=12&Plaza=12&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_edomex', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=13&Plaza=13&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_guanajuato', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=14&Plaza=14&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_guerrero', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=15&Plaza=15&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_hidalgo', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=16&Plaza=16&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_michoacan', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=17&Plaza=17&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_morelos', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=18&Plaza=18&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_nayarit', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=19&Plaza=19&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_oaxaca', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=20&Plaza=20&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_puebla', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=21&Plaza=21&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_queretaro', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=22&Plaza=22&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_quintana_roo', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=23&Plaza=23&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_san_luis', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=24&Plaza=24&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_sinaloa', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=25&Plaza=25&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_sonora', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=26&Plaza=26&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_tabasco', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=27&Plaza=27&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_tamaulipas', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=28&Plaza=28&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_tlaxcala', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=29&Plaza=29&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_veracruz', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=30&Plaza=30&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_yucatan', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=31&Plaza=31&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
+            ('venta_casas_texas', ['http://www.avisosdeocasion.com/Resultados-Inmuebles.aspx?&PlazaBusqueda=34&Plaza=34&pagina=1&idinmueble=3', self._venta_casas_ad_to_record, self._venta_casas_parser]),
         ])
 
+        if site_url:
+            for url_and_method in self._categories.values():
+                url_and_method[0] = url_and_method[0].replace(
+                    'http://www.avisosdeocasion.com', site_url.rstrip('/'))
+
         if verbose:
             logging.basicConfig(format='%(message)s', level=logging.DEBUG)
         else:
             logging.basicConfig(format='%(message)s', level=logging.WARNING)
             # Setting it to logging.INFO shows many messages from http conns
 
+        self._workers = workers
+        self._prefetch_pages = prefetch_pages
+        if workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+        else:
+            self._executor = None
+
+        self.stats = ScrapperStats()
+        if metrics_callback is not None:
+            self.stats.add_callback(metrics_callback)
+
+        if transport is None:
+            if cache_dir:
+                cache = ResponseCache(cache_dir, ttl=cache_ttl,
+                                      max_age=cache_max_age,
+                                      max_size=cache_max_size)
+            else:
+                cache = None
+            transport = Transport(
+                pool_size=workers + prefetch_pages,
+                max_requests_per_second=max_requests_per_second,
+                cache=cache, stats=self.stats, rate_limiter=rate_limiter)
+        self._transport = transport
+
+        if archive_path:
+            self._archive = Archive(archive_path)
+        else:
+            self._archive = None
+
+        if index_path:
+            self._index = AdIndex(index_path)
+        else:
+            self._index = None
+
     def _request_helper(self, url):
-        """This method makes a request to the server and there's a probability
-        that it makes a pause afterwards. If the request timeouts, it retries
-        the request multiple times with a longer pause in between.
+        """Makes a request to the server through the transport, which retries
+        it if it fails and throttles the requests to the server.
+
+        Raises:
+            PermanentError: The server answered with a non retryable error,
+                e.g. 404.
+            TransportError: The server could not be reached.
 
         Returns:
             requests.models.Response
         """
-        remaining_attempts = 10
-        success = False
-        while remaining_attempts and not success:
-            try:
-                response = requests.get(url)
-
-                if random.randint(1, 10) == 1:
-                    wait_time = random.randint(1, 5)
-                    logging.debug("Waiting ", wait_time, " seconds")
-                    time.sleep(wait_time)
-            except:
-                # Server denied request
-                waiting_time = random.randint(5, 15)
-                logging.debug("Server communication problem. Retrying in " +
-                              str(waiting_time) + ' seconds')
-                time.sleep(waiting_time)
-                remaining_attempts -= 1
-            else:
-                success = True
-        if not success:
-            raise Exception("Server communication problem")
+        return self._transport.get(url)
+
+    def _venta_casas_ad_to_record(self, ad):
+        """Converts an ad of category venta_casas into a record. Missing
+        values of the ad are going to be set as None.
+
+        Parameters:
+            ad (dict): The ad, as returned by _scrap_ad().
+
+        Returns:
+            collections.OrderedDict: The columns of the ad, starting with the
+                timestamp of the moment it was scrapped.
+        """
+        return self._venta_casas_parser.parse(ad)
+
+    def _venta_departamentos_ad_to_record(self, ad):
+        """Converts an ad of category venta_departamentos into a record.
+
+        Parameters:
+            ad (dict): The ad, as returned by _scrap_ad().
 
-        return response
+        Returns:
+            collections.OrderedDict
+        """
+        return self._venta_departamentos_parser.parse(ad)
 
-    def _venta_casas_ad_to_df(self, ad):
-        """Uses regex to convert a string representation of an ad of category
-        venta_casas into a 1-row DataFrame. Missing values of the ad are going
-        to be set as None.
+    def _venta_terrenos_ad_to_record(self, ad):
+        """Converts an ad of category venta_terrenos into a record.
 
         Parameters:
-            ad (str): String representation of an ad.
+            ad (dict): The ad, as returned by _scrap_ad().
 
         Returns:
-            pandas.core.frame.DataFrame: A 1-row DataFrame with the ad.
-        """
-        columns = ('precio', 'zona', 'colonia', 'visitas', 'plantas',
-                   'm2_terreno', 'recámaras', 'baños', 'm2_constr',
-                   'fecha_pub', 'latitude', 'longitude', 'url')
-        # Create a dummy dictionary with the columns as keys and None as value
-        dictionary = OrderedDict(zip([i for i in columns],
-                                     [None for i in columns]))
-
-        # Identify the elements of the ad and create a dictionary with them
-        # Mind that some ads have missing elements in the website
-
-        # precio
-        regex_ans = re.search('\$([,0-9]+\s+\w*)', ad)
-        if regex_ans:
-            dictionary['precio'] = regex_ans.group(1)
-        # zona
-        regex_ans = re.search('ZONA:\s+([\w ]+)', ad)
-        if regex_ans:
-            dictionary['zona'] = regex_ans.group(1)
-        # colonia
-        regex_ans = re.search('COLONIA:\s+([\w ]+)', ad)
-        if regex_ans:
-            dictionary['colonia'] = regex_ans.group(1)
-        # visitas
-        regex_ans = re.search('([\d,]+)\s+visitas', ad)
-        if regex_ans:
-            dictionary['visitas'] = regex_ans.group(1)
-        # plantas
-        regex_ans = re.search('(\d+)\s+Planta', ad)
-        if regex_ans:
-            dictionary['plantas'] = regex_ans.group(1)
-        # m2_terreno
-        regex_ans = re.search('([\d.]+)m²\s+de\s+Terreno', ad)
-        if regex_ans:
-            dictionary['m2_terreno'] = regex_ans.group(1)
-        # recámaras
-        regex_ans = re.search('(\d+)\s+Recámara', ad)
-        if regex_ans:
-            dictionary['recámaras'] = regex_ans.group(1)
-        # baños
-        regex_ans = re.search('([\d.]+)\s+Baño', ad)
-        if regex_ans:
-            dictionary['baños'] = regex_ans.group(1)
-        # m2_constr
-        regex_ans = re.search('([\d.]+)m²\s+de\s+Construcción', ad)
-        if regex_ans:
-            dictionary['m2_constr'] = regex_ans.group(1)
-        # fecha_pub
-        regex_ans = re.search('Publicado[\s\w]+( \d+ de \w+)\n', ad)
-        if regex_ans:
-            dictionary['fecha_pub'] = regex_ans.group(1)
-        # latitude
-        regex_ans = re.search('latitude=([\d+-.]+)\n', ad)
-        if regex_ans:
-            dictionary['latitude'] = regex_ans.group(1)
-        # longitude
-        regex_ans = re.search('longitude=([\d+-.]+)\n', ad)
-        if regex_ans:
-            dictionary['longitude'] = regex_ans.group(1)
-        # url
-        regex_ans = re.search('(http.+)\n', ad)
-        if regex_ans:
-            dictionary['url'] = regex_ans.group(1)
-
-        # Convert the dictionary to DataFrame
-        df = DataFrame(dictionary, index=[None])
-        df.index = [datetime.now().isoformat()]
-        df.index.name = 'timestamp'
-        return df
+            collections.OrderedDict
+        """
+        return self._venta_terrenos_parser.parse(ad)
+
+    def _url_of_page(self, category, page_number):
+        """Returns the url of a page of ads of the given category."""
+        url_of_category = self._categories[category][0]
+        return re.sub(r'pagina=\d+', 'pagina='+str(page_number),
+                      url_of_category)
+
+    def _fetch_page_of_ads(self, category, page_number):
+        """
+        Args:
+            category (str): The name of the category of ads.
+            page_number (int): The number of the page of ads.
+
+        Raises:
+            Exception: The page could not be fetched or parsed, with the
+                error as its cause.
 
-    def _venta_departamentos_ad_to_df(self):
-        pass
+        Returns:
+            lxml.html.HtmlElement: The parsed tree of the page of ads, or None
+                if the page is past the last page of ads.
+        """
+        url_on_page = self._url_of_page(category, page_number)
+
+        # Check if this is the last page of ads
+        try:
+            page = self._request_helper(url_on_page)
+            self._archive_page(url_on_page, page, 'listing', category)
+            tree = _parse_page(page)
+            last_page_message = _LAST_PAGE_MESSAGE(tree)
+            logging.debug('Fetched ' + url_on_page)
+        except (TransportError, OSError, etree.ParserError) as e:
+            raise Exception("Detection of last page of ads failed") from e
+        if 'No se encontraron avisos' in str(last_page_message):
+            return None
+        return tree
+
+    def _last_page_number(self, category, initial_page):
+        """Finds the number of the last page of ads of the category by
+        probing pages at exponentially growing distances from initial_page
+        and then doing a binary search between the last page found and the
+        first missing one.
 
-    def _venta_terrenos_ad_to_df(self):
-        pass
+        Args:
+            category (str): The name of the category of ads.
+            initial_page (int): Page known to be the first one of interest.
+
+        Returns:
+            int: The number of the last page of ads, or initial_page - 1 if
+                there are no pages of ads from initial_page on.
+        """
+        if self._fetch_page_of_ads(category, initial_page) is None:
+            return initial_page - 1
+        found, step = initial_page, 1
+        while self._fetch_page_of_ads(category, found + step) is not None:
+            found += step
+            step *= 2
+        missing = found + step
+        while missing - found > 1:
+            middle = (found + missing) // 2
+            if self._fetch_page_of_ads(category, middle) is None:
+                missing = middle
+            else:
+                found = middle
+        return found
 
     def _pages_of_ads(self, category, initial_page):
         """
@@ -262,113 +479,320 @@ class Scrapper():
             initial_page (int): Initial page of ads to start the scrap.
 
         Yields:
-            requests.models.Response: The next page of ads of the given
-                category.
+            lxml.html.HtmlElement: The parsed tree of the next page of ads of
+                the given category.
         """
         page_number = initial_page
+        if self._prefetch_pages:
+            last_page = self._last_page_number(category, initial_page)
+            for tree in self._prefetched_pages_of_ads(category, initial_page,
+                                                      last_page):
+                if tree is None:
+                    return
+                yield tree
+            # Keep going in case pages were added during the scrap
+            page_number = last_page + 1
+
         while True:
-            url_of_category = self._categories[category][0]
-            url_on_page = re.sub('pagina=[\d]+',
-                                 'pagina='+str(page_number), url_of_category)
+            tree = self._fetch_page_of_ads(category, page_number)
+            if tree is None:
+                # Stop iteration
+                return
             page_number += 1
+            yield tree
 
-            # Check if this is the last page of ads
-            try:
-                page = self._request_helper(url_on_page)
-                tree = html.fromstring(page.content)
-                last_page_message = tree.xpath(('//div[@id="celda_rut1"]'
-                                               '/text()'))
-                logging.debug('Fetched ' + url_on_page)
-            except:
-                raise Exception("Detection of last page of ads failed")
-            else:
-                if 'No se encontraron avisos' not in str(last_page_message):
-                    yield page
-                else:
-                    # Stop iteration
-                    return
+    def _prefetched_pages_of_ads(self, category, first_page, last_page):
+        """Fetches the pages of ads from first_page to last_page in the
+        background, keeping up to `prefetch_pages` of them fetched or being
+        fetched ahead of the one being scrapped.
 
-    def _ads_in_a_page(self, page):
-        """
         Args:
-            page (requests.models.Response): the page from which the ads URLs
-                are to be extracted and in turn visted and scrapped as string.
+            category (str): The name of the category of ads.
+            first_page (int): Number of the first page to fetch.
+            last_page (int): Number of the last page to fetch.
 
         Yields:
-            str: A string representation of the next ad in the page.
+            lxml.html.HtmlElement: The parsed tree of the next page of ads, or
+                None if it turned out to be past the last page of ads.
+        """
+        executor = ThreadPoolExecutor(max_workers=self._prefetch_pages)
+        pending = deque()
+        next_page = first_page
+        try:
+            while pending or next_page <= last_page:
+                while (len(pending) < self._prefetch_pages and
+                       next_page <= last_page):
+                    pending.append(executor.submit(self._fetch_page_of_ads,
+                                                   category, next_page))
+                    next_page += 1
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _ads_listed_in_a_page(self, page):
+        """
+        Args:
+            page (lxml.html.HtmlElement): the parsed page of ads from which
+                the ads URLs are to be extracted.
+
+        Returns:
+            collections.OrderedDict: The URLs of the ads in the page, in the
+                order they are listed, with the fingerprint of each ad in the
+                listing as value. The fingerprint changes when the text shown
+                in the listing for the ad, e.g. its price, changes.
         """
-        page_soup = BeautifulSoup(page.text, 'html.parser')
-        for td in page_soup.find_all('td', class_='ar12grisb'):
-            if 'ar12gris' not in str(td.get('class')):
+        listed_ads = OrderedDict()
+        for elem in _ADS_IN_PAGE(page):
+            entry = elem.text_content()
+            if '$' not in entry:
+                # This element in the td is not an ad, ommit it
                 continue
-            for elem in td:
-                # Use try-except because some td are empty
-                try:
-                    entry = elem.get_text()
-                except:
-                    pass
-                else:
-                    if '$' not in entry:
-                        # This element in the td is not an ad, ommit it
-                        continue
-
-                    # Because the website intentionally lists some ads
-                    # incomplete, it's needed to visit each ad to scrap it.
-
-                    # Get the url of the ad
-                    ad_url = elem.find_all('a')[1].get('href')
-
-                    ad_page = self._request_helper(ad_url)
-                    ad_soup = BeautifulSoup(ad_page.text, 'html.parser')
-                    ad_as_string = ''
-
-                    # url of the ad
-                    ad_as_string += ad_url+'\n'
-                    # visitas
-                    visitas = ad_soup.find_all('div', id='pestanas')
-                    ad_as_string += visitas[0].get_text()+'\n'
-                    # zona, colonia and precio
-                    header_zona_colonia_precio = ad_soup.find_all(
-                        'div', id='highlights')
-                    ad_as_string += header_zona_colonia_precio[0].get_text()
-                    ad_as_string += '\n'
-                    # zona and estado
-                    table = ad_soup.find_all('table', class_='ar13gris')
-                    info = table[0].find_all('tr')[0].get_text()
-                    ad_as_string += info + '\n'
-                    # square meters and more details
-                    for td in ad_soup.find_all('td', class_='carac_td'):
-                        ad_as_string += td.get_text()+'\n'
-                    # geolocation
-                    try:
-                        for div in ad_soup.find_all('div', id='divMapa'):
-                            div_content = str(div)
-                            if 'LatitudGM' and 'LongitudGM' in div_content:
-                                lat = re.search('LatitudGM=([\d+-.]+)',
-                                                div_content).group(1)
-                                longit = re.search('LongitudGM=([\d+-.]+)',
-                                                   div_content).group(1)
-                                ad_as_string += 'latitude=' + lat + '\n'
-                                ad_as_string += 'longitude=' + longit + '\n'
-                    except:
-                        pass
-                    yield ad_as_string
-
-    def _ad_to_dataframe(self, ad_text, category):
-        """Converts the ad of the given category to a 1-row DataFrame.
+
+            # Because the website intentionally lists some ads incomplete,
+            # it's needed to visit each ad to scrap it.
+
+            # Get the url of the ad
+            links = _LINKS(elem)
+            if len(links) > 1:
+                ad_url = links[1].get('href')
+                snippet = ad_url + '\n' + ' '.join(entry.split())
+                listed_ads[ad_url] = hashlib.sha1(
+                    snippet.encode('utf-8')).hexdigest()
+        return listed_ads
+
+    def _archive_page(self, url, page, kind, category):
+        """Adds a fetched page to the archive, if the Scrapper has one. A page
+        that came from the cache is only added if its url isn't archived yet,
+        e.g. when the cache was filled by a Scrapper without archive.
+        """
+        if self._archive is None:
+            return
+        if getattr(page, 'from_cache', False) and url in self._archive:
+            return
+        self._archive.append(url, page.content, page.encoding, kind,
+                             category)
+
+    def _scrap_ad(self, ad_url, category=None):
+        """Visits the page of an ad and scraps it.
+
+        Args:
+            ad_url (str): The URL of the ad.
+            category (str): The name of the category of the ad.
+
+        Returns:
+            dict: The ad as returned by _ad_from_tree(), or None if the ad is
+                no longer available.
+        """
+        try:
+            ad_page = self._request_helper(ad_url)
+        except PermanentError as e:
+            logging.debug('Skipping ad: %s', e)
+            self.stats.increment('skipped_ads')
+            return None
+        self._archive_page(ad_url, ad_page, 'ad', category)
+        start = time.monotonic()
+        ad = self._ad_from_tree(ad_url, _parse_page(ad_page))
+        self.stats.observe('parse_seconds', time.monotonic() - start)
+        return ad
+
+    def _ad_from_tree(self, ad_url, tree):
+        """Extracts the details of an ad from the parsed page of the ad.
+
+        Args:
+            ad_url (str): The URL of the ad.
+            tree (lxml.html.HtmlElement): The parsed page of the ad.
+
+        Returns:
+            dict: The ad, as returned by _extract_ad().
+        """
+        return _extract_ad(ad_url, tree)
+
+    def _scrap_ads(self, ad_urls, category=None):
+        """
+        Args:
+            ad_urls (list): the URLs of the ads to be visited and scrapped.
+            category (str): The name of the category of the ads.
+
+        Yields:
+            dict: The next ad, as returned by _scrap_ad(), in the order of the
+                given URLs. The ads that are no longer available are omitted.
+        """
+        if self._executor:
+            # The ads are fetched in parallel, map() keeps them in the order
+            # of the listing
+            ads = self._executor.map(self._scrap_ad, ad_urls,
+                                     repeat(category))
+        else:
+            ads = (self._scrap_ad(ad_url, category) for ad_url in ad_urls)
+        for ad in ads:
+            if ad is not None:
+                yield ad
+
+    def _ad_to_record(self, ad, category):
+        """Converts the ad of the given category to a record.
 
         Args:
-            ad_text (str): A string representation of an ad.
+            ad (dict): The ad, as returned by _scrap_ad().
             category (str): The name of the category of ads.
 
         Returns:
-            pandas.core.frame.DataFrame
+            collections.OrderedDict
         """
         method_to_call = self._categories[category][1]
-        df = method_to_call(ad_text)
-        return df
+        record = method_to_call(ad)
+        return record
+
+    def _records_to_dataframe(self, records):
+        """Builds the DataFrame of the scrapped ads in a single step, instead
+        of appending the ads to it one by one, which copies the whole
+        DataFrame every time.
+
+        Args:
+            records (list): The records of the ads, as returned by
+                _ad_to_record().
+
+        Returns:
+            pandas.core.frame.DataFrame: DataFrame with one row per record,
+                indexed by timestamp.
+        """
+        if not records:
+            return DataFrame()
+        df = DataFrame.from_records(records, columns=list(records[0].keys()))
+        return df.set_index('timestamp')
+
+    def _scrap_listed_ads(self, category, listed_ads, reuse_unchanged=False,
+                          max_record_age=None):
+        """Scraps the given ads of a page of ads.
+
+        Args:
+            category (str): The name of the category of ads.
+            listed_ads (collections.OrderedDict): The URLs of the ads with
+                their fingerprints, as returned by _ads_listed_in_a_page().
+            reuse_unchanged (bool): Take the records of the ads whose
+                fingerprint didn't change from the index instead of visiting
+                them.
+            max_record_age (float): Seconds after which a record in the index
+                is not reused.
+
+        Returns:
+            list: The records of the ads in the order they are listed. The
+                ads that are no longer available are omitted.
+        """
+        if reuse_unchanged:
+            stored_records = self._index.stored_records(
+                category, listed_ads, max_record_age)
+        else:
+            stored_records = {}
+
+        urls_to_scrap = [url for url in listed_ads
+                         if url not in stored_records]
+        scrapped_records = {}
+        for ad in self._scrap_ads(urls_to_scrap, category):
+            start = time.monotonic()
+            scrapped_records[ad['url']] = self._ad_to_record(ad, category)
+            self.stats.observe('record_seconds', time.monotonic() - start)
+            self.stats.increment('ads')
+        if stored_records:
+            self.stats.increment('reused_ads', len(stored_records))
+        if self._index is not None:
+            # The reused ads were seen in the listing as well
+            self._index.add(category,
+                            list(scrapped_records) + list(stored_records))
+            self._index.store_records(
+                category, [(url, listed_ads[url], record)
+                           for url, record in scrapped_records.items()])
+
+        records = []
+        for url in listed_ads:
+            record = stored_records.get(url) or scrapped_records.get(url)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _check_category(self, category, incremental=False,
+                        reuse_unchanged=False):
+        """Checks that the category and the options of a scrap are valid.
+
+        Raises:
+            Exception: The given ad category is not supported, or the options
+                need an index and the Scrapper has none.
+        """
+        if category not in self._categories.keys():
+            raise Exception(('Unrecognized category. '
+                             'Try the atribute \'categories\''))
+        if (incremental or reuse_unchanged) and self._index is None:
+            raise Exception(('Incremental scraps and reuse_unchanged '
+                             'require an index_path'))
+
+    def iter_ads(self, category, ad_limit=None, initial_page=1,
+                 incremental=False, known_pages_to_stop=3,
+                 reuse_unchanged=False, max_record_age=7 * 24 * 3600):
+        """Scraps the ads of the given category and yields their records as
+        they are scrapped, without keeping them in memory. The arguments are
+        the ones of scrap().
+
+        Example:
+            >>> my_scrapper = Scrapper()
+            >>> for record in my_scrapper.iter_ads('venta_casas_cdmx'):
+            ...     print(record['precio'])
+
+        Raises:
+            Exception: The given ad category is not supported.
+
+        Returns:
+            generator: The records of the ads, as collections.OrderedDict.
+        """
+        self._check_category(category, incremental, reuse_unchanged)
+        return self._iter_records(category, ad_limit, initial_page,
+                                  incremental, known_pages_to_stop,
+                                  reuse_unchanged, max_record_age)
+
+    def _iter_records(self, category, ad_limit=None, initial_page=1,
+                      incremental=False, known_pages_to_stop=3,
+                      reuse_unchanged=False, max_record_age=7 * 24 * 3600):
+        """Generator behind iter_ads(), which checks the arguments before.
+
+        Yields:
+            collections.OrderedDict: The record of the next ad.
+        """
+        scrapped_ads = 0
+        known_pages = 0
+        for page in self._pages_of_ads(category, initial_page):
+            listed_ads = self._ads_listed_in_a_page(page)
+            self.stats.increment('pages')
+
+            if incremental:
+                known_urls = self._index.known(category, listed_ads)
+                # Refresh when the known ads were last seen
+                self._index.add(category, known_urls)
+                for url in known_urls:
+                    del listed_ads[url]
+                if listed_ads:
+                    known_pages = 0
+                else:
+                    known_pages += 1
+                    if known_pages >= known_pages_to_stop:
+                        return
+                    continue
+
+            if ad_limit:
+                for url in list(listed_ads)[ad_limit - scrapped_ads:]:
+                    del listed_ads[url]
 
-    def scrap(self, category, ad_limit=None, initial_page=1):
+            for record in self._scrap_listed_ads(
+                    category, listed_ads, reuse_unchanged, max_record_age):
+                scrapped_ads += 1
+                yield record
+
+            if ad_limit and scrapped_ads >= ad_limit:
+                return
+
+    def scrap(self, category, ad_limit=None, initial_page=1,
+              incremental=False, known_pages_to_stop=3,
+              reuse_unchanged=False, max_record_age=7 * 24 * 3600,
+              typed=False):
         """Returns a DataFrame with the information of the ads of the given
         category.
 
@@ -376,6 +800,19 @@ class Scrapper():
             category (str): Name of the category of ads.
             ad_limit (int): Number of ads to scrap.
             initial_page (int): Initial page of ads to start the scrap.
+            incremental (bool): Only scrap the ads that are not in the index
+                of scrapped ads. Requires the Scrapper to have an index_path.
+            known_pages_to_stop (int): In incremental mode, stop after this
+                many consecutive pages of ads without new ads.
+            reuse_unchanged (bool): Don't visit the ads that look the same in
+                the listing as when they were last scrapped, and return their
+                records from the index instead. Requires the Scrapper to have
+                an index_path.
+            max_record_age (float): Seconds after which the record of an
+                unchanged ad is scrapped again. None means no limit.
+            typed (bool): Convert the columns into numbers, categories and
+                dates with clean_ads() instead of leaving them as the
+                strings shown in the website.
 
         Raises:
             Exception: The given ad category is not supported.
@@ -383,31 +820,386 @@ class Scrapper():
         Returns:
             pandas.core.frame.DataFrame: DataFrame with the scrapped ads.
         """
-        if category not in self._categories.keys():
-            raise Exception(('Unrecognized category. '
-                             'Try the atribute \'categories\''))
-
-        final_df = DataFrame()
-        scrapped_ads = 0
-        remaining_ads = True
+        records = []
+        ads = self.iter_ads(category, ad_limit, initial_page, incremental,
+                            known_pages_to_stop, reuse_unchanged,
+                            max_record_age)
         print("Started web scraping")
-        for page in self._pages_of_ads(category, initial_page):
-            if not remaining_ads:
-                break
-            for ad in self._ads_in_a_page(page):
-                if not remaining_ads:
-                    break
-                single_ad = self._ad_to_dataframe(ad, category)
-                final_df = final_df.append(single_ad)
-                scrapped_ads += 1
+        for record in ads:
+            records.append(record)
+            print("Progress: %s scrapped ads\r" % (str(len(records))),
+                  end='')
+        print("\nFinished web scraping")
+        df = self._records_to_dataframe(records)
+        if typed:
+            df = clean_ads(df)
+        return df
+
+    def scrap_to_file(self, category, path, chunk_size=None, **options):
+        """Scraps the ads of the given category into a file, writing them
+        every `chunk_size` ads. The format is given by the extension of the
+        path: .csv, .jsonl or .parquet.
+
+        Args:
+            category (str): Name of the category of ads.
+            path (str): Path of the file.
+            chunk_size (int): Number of ads kept in memory before writing
+                them.
+            **options: Options of iter_ads(), e.g. ad_limit or incremental.
+                The ads are written as scrapped, so there's no `typed`
+                option; convert them with clean_ads() once read back.
+
+        Raises:
+            Exception: The given ad category or file extension is not
+                supported.
+
+        Returns:
+            int: The number of ads written.
+        """
+        ads = self.iter_ads(category, **options)
+        with open_sink(path, chunk_size) as sink:
+            print("Started web scraping")
+            for scrapped_ads, record in enumerate(ads, 1):
+                sink.write(record)
                 print("Progress: %s scrapped ads\r" % (str(scrapped_ads)),
                       end='')
+            print("\nFinished web scraping")
+        return sink.written
+
+    def scrap_many(self, categories=None, category_workers=4, combine=True,
+                   progress=None, typed=False, **options):
+        """Scraps several categories at the same time. Every category is
+        scrapped by its own thread, up to `category_workers` at once, and
+        the ads of all of them are visited by the same pool of `workers`
+        threads of the Scrapper, a page of ads of each category at a time.
+        All the requests share the limit of requests per second of the
+        Scrapper.
+
+        A category that fails is logged and left out of the result.
+
+        Example:
+            >>> my_scrapper = Scrapper(workers=8, max_requests_per_second=5)
+            >>> df = my_scrapper.scrap_many(['venta_casas_cdmx',
+            ...                              'venta_casas_jalisco'],
+            ...                             ad_limit=100)
+            >>> df.groupby('category').size()
+
+        Args:
+            categories (list): Names of the categories of ads. By default all
+                the supported categories.
+            category_workers (int): Number of categories scrapped at once.
+            combine (bool): Return a single DataFrame with a 'category'
+                column instead of a dict of DataFrames.
+            progress (callable): Called with the name of a category and its
+                number of scrapped ads every time a page of ads of it is
+                scrapped. By default the progress is printed.
+            typed (bool): Convert the columns into numbers, categories and
+                dates with clean_ads().
+            **options: Options of scrap(), e.g. ad_limit or incremental,
+                applied to every category.
+
+        Raises:
+            Exception: One of the given ad categories is not supported.
+            TypeError: One of the options is not an option of scrap().
 
-                if ad_limit and scrapped_ads >= ad_limit:
-                    remaining_ads = False
-                    break
+        Returns:
+            pandas.core.frame.DataFrame or dict: The scrapped ads, either in
+                a single DataFrame or in a dict with a DataFrame per
+                category.
+        """
+        if categories is None:
+            categories = list(self._categories.keys())
+        for category in categories:
+            self._check_category(category, options.get('incremental'),
+                                 options.get('reuse_unchanged'))
+        # The generators bind the options right away, so a misspelled option
+        # fails here instead of in every category thread
+        iterators = OrderedDict(
+            (category, self._iter_records(category, **options))
+            for category in categories)
+
+        # Besides the workers, every category thread fetches its pages of ads,
+        # or has prefetch_pages threads fetching them
+        if hasattr(self._transport, 'ensure_pool_size'):
+            self._transport.ensure_pool_size(
+                self._workers + min(category_workers, len(categories)) *
+                max(1, self._prefetch_pages))
+
+        scrapped_ads = OrderedDict((category, 0) for category in categories)
+        lock = threading.Lock()
+
+        def print_progress(category, count):
+            with lock:
+                scrapped_ads[category] = count
+                started = sum(1 for c in scrapped_ads.values() if c)
+                print("Progress: %s scrapped ads, %s of %s categories "
+                      "started\r" % (sum(scrapped_ads.values()), started,
+                                     len(categories)), end='')
+
+        if progress is None:
+            progress = print_progress
+
+        def scrap_category(category):
+            records = []
+            for record in iterators[category]:
+                records.append(record)
+                progress(category, len(records))
+            return self._records_to_dataframe(records)
+
+        frames = OrderedDict()
+        print("Started web scraping")
+        with ThreadPoolExecutor(max_workers=category_workers) as executor:
+            futures = OrderedDict(
+                (category, executor.submit(scrap_category, category))
+                for category in categories)
+            for category, future in futures.items():
+                try:
+                    frames[category] = future.result()
+                except Exception:
+                    logging.exception('Scrap of %s failed', category)
         print("\nFinished web scraping")
-        return final_df
+
+        if not combine:
+            if typed:
+                for category, df in frames.items():
+                    frames[category] = clean_ads(df)
+            return frames
+        non_empty = []
+        for category, df in frames.items():
+            if len(df):
+                df.insert(0, 'category', category)
+                non_empty.append(df)
+        if not non_empty:
+            return DataFrame()
+        df = concat(non_empty)
+        if typed:
+            df = clean_ads(df)
+        return df
+
+    def seed(self, queue, category, initial_page=1):
+        """Adds the first page of ads of the given category to a work queue,
+        to be crawled by the Scrappers calling work() on it.
+
+        Args:
+            queue (elnortescrapper.workqueue.WorkQueue): The work queue.
+            category (str): Name of the category of ads.
+            initial_page (int): Initial page of ads to start the crawl.
+
+        Raises:
+            Exception: The given ad category is not supported.
+
+        Returns:
+            int: Number of tasks added, 0 if the page was already enqueued.
+        """
+        self._check_category(category)
+        return queue.put([(LISTING, category,
+                           self._url_of_page(category, initial_page),
+                           initial_page)])
+
+    def _work_on_listing(self, queue, task):
+        """Enqueues the ads of a page of ads and the next page, unless it is
+        past the last page.
+        """
+        page = self._fetch_page_of_ads(task.category, task.page_number)
+        if page is None:
+            return
+        self.stats.increment('pages')
+        next_page = task.page_number + 1
+        tasks = [(AD, task.category, url, None)
+                 for url in self._ads_listed_in_a_page(page)]
+        tasks.append((LISTING, task.category,
+                      self._url_of_page(task.category, next_page),
+                      next_page))
+        queue.put(tasks)
+
+    def _work_on_ad(self, task):
+        """Scraps an ad and returns its record, or None if the ad is no
+        longer available.
+        """
+        ad = self._scrap_ad(task.url, task.category)
+        if ad is None:
+            return None
+        start = time.monotonic()
+        record = self._ad_to_record(ad, task.category)
+        self.stats.observe('record_seconds', time.monotonic() - start)
+        self.stats.increment('ads')
+        if self._index is not None:
+            self._index.add(task.category, [task.url])
+        return record
+
+    def work(self, queue, worker_id=None, lease_seconds=300, max_tasks=None,
+             idle_timeout=30, poll_interval=1):
+        """Crawls the tasks of a work queue seeded with seed(), along with any
+        other Scrappers working on the same queue, in this or other
+        processes or hosts. Every page of ads enqueues its ads and the next
+        page, and the records of the ads are stored in the queue, from where
+        they are taken with collect(). With `workers` > 1, that many tasks
+        are worked on at once.
+
+        A task that fails is given back to the queue to be retried, and the
+        tasks of a worker that crashed are retried when their lease expires.
+        To keep the site from seeing more requests as workers are added,
+        give the Scrappers the rate budget of the queue as rate_limiter.
+
+        Example:
+            >>> queue = SQLiteWorkQueue('crawl.db')
+            >>> # On every worker
+            >>> my_scrapper = Scrapper(workers=4,
+            ...                        rate_limiter=queue.rate_budget(5))
+            >>> my_scrapper.seed(queue, 'venta_casas_cdmx')
+            >>> my_scrapper.work(queue)
+            >>> # Once all of them finished
+            >>> df = my_scrapper.collect(queue, 'venta_casas_cdmx')
+
+        Args:
+            queue (elnortescrapper.workqueue.WorkQueue): The work queue.
+            worker_id (str): Name of the worker in the queue. By default the
+                host, the process and the thread.
+            lease_seconds (float): Seconds a task is kept before other
+                workers can take it. Must be longer than the time it takes
+                to fetch a page, retries included.
+            max_tasks (int): Stop after this many tasks. None means no limit.
+            idle_timeout (float): Stop after this many seconds without tasks
+                available while other workers still have leased tasks, once
+                the first of their leases expired without the task being
+                leased again. Until then the tasks of a worker that crashed
+                may still have to be taken over.
+            poll_interval (float): Seconds between attempts to lease a task
+                when there's none available.
+
+        Returns:
+            int: Number of tasks completed.
+        """
+        if worker_id is None:
+            worker_id = '%s-%d' % (socket.gethostname(), os.getpid())
+        completed = [0]
+        lock = threading.Lock()
+
+        def work_loop(thread_number):
+            name = '%s-%d' % (worker_id, thread_number)
+            idle_since = None
+            while True:
+                with lock:
+                    if max_tasks is not None and completed[0] >= max_tasks:
+                        return
+                polled_at = time.time()
+                task = queue.lease(name, lease_seconds)
+                if task is None:
+                    if queue.finished():
+                        return
+                    if idle_since is None:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since > idle_timeout:
+                        # Wait for the leases of the workers that crashed to
+                        # expire, to take their tasks
+                        expiry = queue.lease_expiry()
+                        if expiry is None or expiry < polled_at:
+                            return
+                    time.sleep(poll_interval)
+                    continue
+                idle_since = None
+                try:
+                    if task.kind == LISTING:
+                        self._work_on_listing(queue, task)
+                        record = None
+                    else:
+                        record = self._work_on_ad(task)
+                except Exception:
+                    logging.exception('Task %s of %s failed', task.url,
+                                      task.category)
+                    if not queue.fail(task):
+                        logging.warning('Lease of task %s of %s lost',
+                                        task.url, task.category)
+                    continue
+                if not queue.complete(task, record):
+                    # Another worker took the task after the lease expired
+                    logging.warning('Lease of task %s of %s lost, not '
+                                    'completed', task.url, task.category)
+                    continue
+                with lock:
+                    completed[0] += 1
+
+        if self._executor is None:
+            work_loop(0)
+        else:
+            list(self._executor.map(work_loop, range(self._workers)))
+        return completed[0]
+
+    def collect(self, queue, category, typed=False):
+        """Returns a DataFrame with the ads of the given category scrapped by
+        the workers of a work queue.
+
+        Args:
+            queue (elnortescrapper.workqueue.WorkQueue): The work queue.
+            category (str): Name of the category of ads.
+            typed (bool): Convert the columns with clean_ads().
+
+        Raises:
+            Exception: The given ad category is not supported.
+
+        Returns:
+            pandas.core.frame.DataFrame: DataFrame with the scrapped ads, in
+                the order they were listed.
+        """
+        self._check_category(category)
+        df = self._records_to_dataframe(queue.records(category))
+        if typed:
+            df = clean_ads(df)
+        return df
+
+    def _parser_of(self, category):
+        """Returns the parser of the ads of the given category."""
+        return self._categories[category][2]
+
+    def reparse(self, category, archive_path=None, processes=None,
+                chunk_size=200, typed=False):
+        """Parses again the archived pages of the ads of the given category,
+        without fetching them, using a pool of processes. For every ad only
+        its last archived page is parsed.
+
+        Example:
+            >>> my_scrapper = Scrapper(archive_path='crawl.archive')
+            >>> df = my_scrapper.scrap('venta_casas_cdmx')
+            >>> # Later, after a change in the parsers
+            >>> df = Scrapper().reparse('venta_casas_cdmx', 'crawl.archive')
+
+        Args:
+            category (str): Name of the category of ads.
+            archive_path (str): Path of the archive. By default the archive
+                of the Scrapper.
+            processes (int): Number of processes. By default the number of
+                CPUs.
+            chunk_size (int): Number of pages parsed by a process at a time.
+            typed (bool): Convert the columns with clean_ads().
+
+        Raises:
+            Exception: The given ad category is not supported or there's no
+                archive.
+
+        Returns:
+            pandas.core.frame.DataFrame: DataFrame with the ads, with the
+                time their pages were fetched as timestamp.
+        """
+        self._check_category(category)
+        if archive_path is None:
+            if self._archive is None:
+                raise Exception('reparse requires an archive_path')
+            archive_path = self._archive.path
+
+        entries = Archive(archive_path).entries(kind='ad', category=category)
+        chunks = [entries[i:i + chunk_size]
+                  for i in range(0, len(entries), chunk_size)]
+        records = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for chunk_records in executor.map(_reparse_entries,
+                                              repeat(archive_path), chunks,
+                                              repeat(self._parser_of(
+                                                  category))):
+                records.extend(chunk_records)
+        df = self._records_to_dataframe(records)
+        if typed:
+            df = clean_ads(df)
+        return df
 
     @property
     def categories(self):
@@ -419,3 +1211,4 @@ class Scrapper():
         """
         df = DataFrame({'category': list(self._categories.keys())})
         return df
+
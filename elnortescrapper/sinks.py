@@ -0,0 +1,188 @@
+"""
+Sinks
+
+This module implements writers that save the records of the ads to a file as
+they are scrapped, in chunks, so that the memory used doesn't grow with the
+number of ads and a failed scrap keeps the ads written so far.
+
+Example:
+    >>> from elnortescrapper import Scrapper, CSVSink
+    >>> my_scrapper = Scrapper()
+    >>> with CSVSink('venta_casas_cdmx.csv', chunk_size=500) as sink:
+    ...     sink.write_all(my_scrapper.iter_ads('venta_casas_cdmx'))
+"""
+
+import csv
+import json
+import os
+
+
+class Sink():
+    """Base class of the sinks. Records are buffered and written every
+    `chunk_size` records, and when the sink is closed.
+
+    Subclasses implement _write_chunk().
+    """
+
+    def __init__(self, path, chunk_size=1000):
+        """
+        Args:
+            path (str): Path of the file. It is overwritten if it exists.
+            chunk_size (int): Number of records kept in memory before
+                writing them.
+        """
+        self.path = path
+        self._chunk_size = chunk_size
+        self._chunk = []
+        self._columns = None
+        self.written = 0
+
+    def write(self, record):
+        """Adds a record to the sink.
+
+        Args:
+            record (dict): The record of an ad.
+        """
+        if self._columns is None:
+            self._columns = list(record.keys())
+        self._chunk.append(record)
+        if len(self._chunk) >= self._chunk_size:
+            self.flush()
+
+    def write_all(self, records):
+        """Adds all the records of an iterable, e.g. Scrapper.iter_ads(), to
+        the sink.
+
+        Args:
+            records (iterable): The records of the ads.
+
+        Returns:
+            int: The number of records written by the sink so far.
+        """
+        for record in records:
+            self.write(record)
+        self.flush()
+        return self.written
+
+    def flush(self):
+        """Writes the buffered records to the file."""
+        if self._chunk:
+            self._write_chunk(self._chunk)
+            self.written += len(self._chunk)
+            self._chunk = []
+
+    def _write_chunk(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        """Writes the buffered records and closes the file."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CSVSink(Sink):
+    """Writes the records to a CSV file with a header with the columns of the
+    first record.
+    """
+
+    def __init__(self, path, chunk_size=1000):
+        super().__init__(path, chunk_size)
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = None
+
+    def _write_chunk(self, records):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, self._columns,
+                                          extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerows(records)
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class JSONLinesSink(Sink):
+    """Writes the records to a file with a JSON object per line."""
+
+    def __init__(self, path, chunk_size=1000):
+        super().__init__(path, chunk_size)
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def _write_chunk(self, records):
+        self._file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n'
+                                 for record in records))
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class ParquetSink(Sink):
+    """Writes the records to a Parquet file, a row group per chunk. The
+    columns are the ones of the first record, stored as strings.
+
+    Requires pyarrow.
+    """
+
+    def __init__(self, path, chunk_size=10000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise Exception('ParquetSink requires pyarrow')
+        super().__init__(path, chunk_size)
+        self._pyarrow = pyarrow
+        self._writer = None
+
+    def _write_chunk(self, records):
+        pa = self._pyarrow
+        if self._writer is None:
+            self._schema = pa.schema([(column, pa.string())
+                                      for column in self._columns])
+            self._writer = pa.parquet.ParquetWriter(self.path, self._schema)
+        arrays = []
+        for column in self._columns:
+            values = [record.get(column) for record in records]
+            arrays.append(pa.array(
+                [None if value is None else str(value) for value in values],
+                type=pa.string()))
+        self._writer.write_table(pa.Table.from_arrays(arrays,
+                                                      schema=self._schema))
+
+    def close(self):
+        super().close()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_sink(path, chunk_size=None):
+    """Returns the sink for the extension of the path: .csv, .jsonl or
+    .parquet.
+
+    Args:
+        path (str): Path of the file.
+        chunk_size (int): Number of records kept in memory before writing
+            them. By default the one of the sink.
+
+    Raises:
+        Exception: The extension is not supported.
+
+    Returns:
+        Sink
+    """
+    sinks = {'.csv': CSVSink, '.jsonl': JSONLinesSink,
+             '.parquet': ParquetSink}
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in sinks:
+        raise Exception('Unsupported file extension: %s' % extension)
+    if chunk_size is None:
+        return sinks[extension](path)
+    return sinks[extension](path, chunk_size)
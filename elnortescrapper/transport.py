@@ -0,0 +1,292 @@
+"""
+Transport
+
+This module implements the HTTP transport used by the Scrapper: a persistent
+keep-alive session with explicit timeouts, retries with exponential backoff,
+a token bucket that throttles the requests sent to each host and an optional
+on-disk cache of the responses.
+"""
+
+import random
+import time
+import threading
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import ScrapperStats
+
+
+class TransportError(Exception):
+    """The server could not be reached after all the attempts."""
+
+
+class PermanentError(TransportError):
+    """The server answered with a status code that retrying is not going to
+    fix, e.g. 404 for an ad that was removed.
+
+    Attributes:
+        response (requests.models.Response): The response of the server.
+    """
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class TokenBucket():
+    """Token bucket that allows `rate` requests per second on average with
+    bursts of at most `capacity` requests. It is safe to share it between
+    threads.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self._rate = float(rate)
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self):
+        """Blocks until a token is available and takes it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity,
+                               self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            # The token is taken even if it is not there yet, so that the
+            # threads waiting for it are served in order
+            self._tokens -= 1
+            wait_time = -self._tokens / self._rate
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class Transport():
+    """Makes GET requests over a pooled requests.Session.
+
+    Connection and read timeouts make every request fail in a bounded time.
+    Failed requests (the errors in `retryable_errors` and the status codes
+    in `retryable_status`) are retried with exponential backoff and jitter,
+    honouring the Retry-After header when the server sends one. Any other
+    4xx status raises PermanentError straight away.
+
+    If a ResponseCache is given, fresh cached pages are returned without
+    making a request, and stale ones are revalidated with a conditional
+    request when the server supports it.
+
+    Any object with a `get(url)` method returning a requests Response can be
+    given to the Scrapper in place of this class.
+    """
+
+    retryable_status = (408, 429, 500, 502, 503, 504)
+    # Network errors, and bodies cut short or garbled on their way
+    retryable_errors = (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.ContentDecodingError)
+
+    def __init__(self, pool_size=1, connect_timeout=10, read_timeout=30,
+                 max_attempts=10, backoff_base=1, backoff_max=60,
+                 max_requests_per_second=None, burst=1, cache=None,
+                 stats=None, rate_limiter=None):
+        """
+        Args:
+            pool_size (int): Number of keep-alive connections kept per host.
+                Should match the number of threads making requests.
+            connect_timeout (float): Seconds to wait for the connection.
+            read_timeout (float): Seconds to wait for the server to answer.
+            max_attempts (int): Number of attempts before giving up.
+            backoff_base (float): Seconds of the first backoff, doubled on
+                every failed attempt.
+            backoff_max (float): Upper bound of the backoff in seconds, also
+                applied to the waits asked for with Retry-After.
+            max_requests_per_second (float): Maximum number of requests sent
+                to the same host per second. None means no limit.
+            burst (int): Number of requests that can be sent to a host at
+                once before the limit applies.
+            cache (elnortescrapper.cache.ResponseCache): Cache of the
+                responses. None means no cache.
+            stats (elnortescrapper.metrics.ScrapperStats): Metrics updated
+                with the requests. By default new ones.
+            rate_limiter: Object with a consume() method waited for before
+                every request, in addition to the limit per host, e.g. the
+                rate budget shared by the workers of a WorkQueue.
+        """
+        self._session = requests.Session()
+        self._pool_size = 0
+        self.ensure_pool_size(pool_size)
+        self._timeout = (connect_timeout, read_timeout)
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._max_requests_per_second = max_requests_per_second
+        self._burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._cache = cache
+        self._rate_limiter = rate_limiter
+        self.stats = stats if stats is not None else ScrapperStats()
+
+    def _throttle(self, url):
+        """Waits for the rate limiter, if any, and for the token bucket of the
+        host of the url.
+        """
+        if self._rate_limiter is not None:
+            self._rate_limiter.consume()
+        if not self._max_requests_per_second:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self._max_requests_per_second,
+                                     self._burst)
+                self._buckets[host] = bucket
+        bucket.consume()
+
+    def _backoff(self, attempt, response=None):
+        """Returns the seconds to wait before the next attempt, at most
+        backoff_max, even if the server asks for a longer wait.
+
+        Args:
+            attempt (int): Number of failed attempts so far.
+            response (requests.models.Response): The failed response, if the
+                server answered.
+        """
+        if response is not None:
+            retry_after = _retry_after_seconds(response)
+            if retry_after is not None:
+                return min(self._backoff_max, retry_after)
+        ceiling = min(self._backoff_max, self._backoff_base * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def get(self, url, headers=None):
+        """Returns the page of the url, from the cache if there's a fresh copy
+        of it or from the server otherwise.
+
+        Args:
+            url (str): The url to request.
+            headers (dict): Additional headers of the request.
+
+        Raises:
+            PermanentError: The server answered with a non retryable error.
+            TransportError: All the attempts failed.
+
+        Returns:
+            requests.models.Response
+        """
+        if self._cache is None:
+            return self._fetch(url, headers)
+
+        cached_page = self._cache.get(url)
+        if cached_page is not None:
+            if cached_page.age() < self._cache.ttl:
+                self.stats.increment('cache_hits')
+                return cached_page.to_response()
+            headers = dict(headers or {}, **cached_page.validators())
+
+        response = self._fetch(url, headers)
+        if response.status_code == 304 and cached_page is not None:
+            logging.debug('Not modified: %s', url)
+            self.stats.increment('not_modified')
+            self._cache.touch(cached_page)
+            return cached_page.to_response()
+        if response.status_code == 200:
+            self._cache.put(url, response)
+        return response
+
+    def _fetch(self, url, headers=None):
+        """Requests the url to the server.
+
+        Args:
+            url (str): The url to request.
+            headers (dict): Additional headers of the request.
+
+        Raises:
+            PermanentError: The server answered with a non retryable error.
+            TransportError: All the attempts failed.
+
+        Returns:
+            requests.models.Response
+        """
+        for attempt in range(self._max_attempts):
+            if attempt:
+                self.stats.increment('retries')
+            self._throttle(url)
+            response = None
+            self.stats.increment('requests')
+            start = time.monotonic()
+            try:
+                response = self._session.get(url, headers=headers,
+                                             timeout=self._timeout)
+            except self.retryable_errors as e:
+                logging.debug('Server communication problem: %s', e)
+            else:
+                self.stats.observe('request_seconds',
+                                   time.monotonic() - start)
+                self.stats.increment('bytes', len(response.content))
+                if response.status_code in self.retryable_status:
+                    logging.debug('Server answered %s for %s',
+                                  response.status_code, url)
+                elif response.status_code >= 400:
+                    self.stats.increment('errors')
+                    raise PermanentError('Server answered %s for %s' %
+                                         (response.status_code, url),
+                                         response)
+                else:
+                    return response
+            if attempt + 1 < self._max_attempts:
+                wait_time = self._backoff(attempt, response)
+                logging.debug('Retrying in %.1f seconds', wait_time)
+                time.sleep(wait_time)
+        self.stats.increment('errors')
+        raise TransportError('Server communication problem')
+
+    def ensure_pool_size(self, pool_size):
+        """Grows the connection pool to keep `pool_size` connections per host,
+        if it keeps less, so that as many threads can make requests at once
+        without discarding connections. It must not be called while requests
+        are being made, since the connections of the old pool are closed.
+
+        Args:
+            pool_size (int): Number of keep-alive connections kept per host.
+        """
+        if pool_size <= self._pool_size:
+            return
+        old_adapter = self._session.adapters.get('http://')
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        if self._pool_size:
+            old_adapter.close()
+        self._pool_size = pool_size
+
+    def close(self):
+        """Closes the connections of the pool."""
+        self._session.close()
+
+
+def _retry_after_seconds(response):
+    """Returns the seconds of the Retry-After header of the response, which
+    can be either a number of seconds or a date, or None if there's no valid
+    header.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0, (date - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,320 @@
+"""
+Work queue
+
+This module implements the shared work queue of a distributed crawl, where
+several Scrappers, in different processes or hosts, take the pages of ads and
+the ads of a category from the same queue instead of splitting the categories
+or the pages between them by hand.
+
+A worker leases a task for some time and completes or fails it before the
+lease expires. The tasks of a worker that crashed are leased again by the
+others once their lease expires. Tasks are unique, so an ad listed in several
+pages, or enqueued by several workers, is scrapped once. The queue also keeps
+a request budget shared by all the workers, so that adding workers doesn't
+increase the load on the site.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+# Kinds of tasks
+LISTING = 'listing'
+AD = 'ad'
+
+Task = namedtuple('Task', ['id', 'kind', 'category', 'url', 'page_number',
+                           'attempts', 'worker'])
+Task.__doc__ = """Task of a work queue: a page of ads ('listing') or an ad
+('ad') of a category, leased by a worker. page_number is None for ads.
+"""
+
+
+class WorkQueue():
+    """Interface of the work queues used by Scrapper.seed() and
+    Scrapper.work(). Subclasses store the tasks in a backend shared by the
+    workers, e.g. a SQLite database or a Redis server.
+    """
+
+    def put(self, tasks):
+        """Adds tasks to the queue, ignoring the ones already in it.
+
+        Args:
+            tasks (list): Tuples of kind, category, url and page number.
+
+        Returns:
+            int: Number of tasks added.
+        """
+        raise NotImplementedError
+
+    def lease(self, worker_id, lease_seconds=300):
+        """Takes the next pending task, or one whose lease expired, for
+        lease_seconds.
+
+        Args:
+            worker_id (str): Name of the worker taking the task.
+            lease_seconds (float): Seconds the task is kept by the worker.
+
+        Returns:
+            Task: The task, or None if there's no task available.
+        """
+        raise NotImplementedError
+
+    def complete(self, task, record=None):
+        """Marks a leased task as done, unless its lease expired and it was
+        leased again by another worker, or by the same one.
+
+        Args:
+            task (Task): The task, as returned by lease().
+            record (dict): The record of the ad, for tasks of ads.
+
+        Returns:
+            bool: False if the lease of the task was lost, in which case the
+                task is left as it is.
+        """
+        raise NotImplementedError
+
+    def fail(self, task, retry=True):
+        """Gives a leased task back to the queue, or marks it as failed if
+        retry is False or it was attempted too many times, unless its lease
+        was lost.
+
+        Args:
+            task (Task): The task, as returned by lease().
+            retry (bool): Whether the task should be attempted again.
+
+        Returns:
+            bool: False if the lease of the task was lost, in which case the
+                task is left as it is.
+        """
+        raise NotImplementedError
+
+    def records(self, category):
+        """Returns the records of the ads of a category, in the order they
+        were enqueued.
+        """
+        raise NotImplementedError
+
+    def counts(self):
+        """Returns the number of tasks in each state: pending, leased, done
+        and failed.
+        """
+        raise NotImplementedError
+
+    def lease_expiry(self):
+        """Returns the time, as given by time.time(), when the first of the
+        leases of the leased tasks expires, or None if there are no leased
+        tasks.
+        """
+        raise NotImplementedError
+
+    def finished(self):
+        """Returns whether there are no pending or leased tasks left."""
+        counts = self.counts()
+        return not counts['pending'] and not counts['leased']
+
+    def rate_budget(self, max_requests_per_second):
+        """Returns an object with a consume() method that blocks until the
+        workers sharing the queue can send one more request, to be given to
+        the Scrapper as rate_limiter.
+        """
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue stored in a SQLite database, shared by the workers running
+    on the same host or with access to the same file system. It is safe to
+    share it between threads.
+    """
+
+    states = ('pending', 'leased', 'done', 'failed')
+
+    def __init__(self, path, max_attempts=5, timeout=60):
+        """
+        Args:
+            path (str): Path of the SQLite database. It is created if it
+                doesn't exist.
+            max_attempts (int): Number of leases of a task before it is
+                marked as failed.
+            timeout (float): Seconds to wait for the database when another
+                worker is writing to it.
+        """
+        self.path = path
+        self._max_attempts = max_attempts
+        # Transactions are started explicitly, see _transaction()
+        self._connection = sqlite3.connect(path, timeout=timeout,
+                                           isolation_level=None,
+                                           check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._transaction() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS tasks ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'kind TEXT NOT NULL, '
+                'category TEXT NOT NULL, '
+                'url TEXT NOT NULL, '
+                'page_number INTEGER, '
+                "state TEXT NOT NULL DEFAULT 'pending', "
+                'worker TEXT, '
+                'lease_until REAL, '
+                'attempts INTEGER NOT NULL DEFAULT 0, '
+                'record TEXT, '
+                'UNIQUE (kind, category, url))')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS tasks_state '
+                'ON tasks (state, id)')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS budgets ('
+                'name TEXT PRIMARY KEY, '
+                'next_slot REAL NOT NULL)')
+
+    def _transaction(self):
+        """Returns a context manager that runs its block in a transaction
+        which locks the database for writing from the start, so that two
+        workers can't lease the same task.
+        """
+        return _Transaction(self._connection, self._lock)
+
+    def put(self, tasks):
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                'INSERT OR IGNORE INTO tasks '
+                '(kind, category, url, page_number) VALUES (?, ?, ?, ?)',
+                tasks)
+            return connection.total_changes - before
+
+    def lease(self, worker_id, lease_seconds=300):
+        now = time.time()
+        with self._transaction() as connection:
+            # Tasks of crashed workers attempted too many times
+            connection.execute(
+                "UPDATE tasks SET state = 'failed' WHERE state = 'leased' "
+                'AND lease_until < ? AND attempts >= ?',
+                (now, self._max_attempts))
+            row = connection.execute(
+                'SELECT id, kind, category, url, page_number, attempts '
+                "FROM tasks WHERE state = 'pending' OR "
+                "(state = 'leased' AND lease_until < ?) "
+                'ORDER BY id LIMIT 1', (now,)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, "
+                'lease_until = ?, attempts = attempts + 1 WHERE id = ?',
+                (worker_id, now + lease_seconds, row[0]))
+        return Task(*row[:5], attempts=row[5] + 1, worker=worker_id)
+
+    # Matches a task only while it is still leased with the lease of the Task,
+    # which changes the attempts even if the same worker leases it again
+    _OWN_LEASE = ("id = ? AND state = 'leased' AND worker = ? "
+                  'AND attempts = ?')
+
+    def complete(self, task, record=None):
+        if record is not None:
+            record = json.dumps(record)
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE tasks SET state = 'done', lease_until = NULL, "
+                'record = ? WHERE ' + self._OWN_LEASE,
+                (record, task.id, task.worker, task.attempts))
+            return cursor.rowcount == 1
+
+    def fail(self, task, retry=True):
+        if retry and task.attempts < self._max_attempts:
+            state = 'pending'
+        else:
+            state = 'failed'
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                'UPDATE tasks SET state = ?, lease_until = NULL '
+                'WHERE ' + self._OWN_LEASE,
+                (state, task.id, task.worker, task.attempts))
+            return cursor.rowcount == 1
+
+    def records(self, category):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT record FROM tasks WHERE kind = ? AND "
+                "category = ? AND state = 'done' AND record IS NOT NULL "
+                'ORDER BY id', (AD, category)).fetchall()
+        return [json.loads(row[0], object_pairs_hook=OrderedDict)
+                for row in rows]
+
+    def counts(self):
+        counts = OrderedDict((state, 0) for state in self.states)
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT state, COUNT(*) FROM tasks GROUP BY state')
+            counts.update(rows)
+        return counts
+
+    def lease_expiry(self):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT MIN(lease_until) FROM tasks WHERE state = 'leased'"
+            ).fetchone()
+        return row[0]
+
+    def rate_budget(self, max_requests_per_second):
+        return SQLiteRateBudget(self, max_requests_per_second)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class SQLiteRateBudget():
+    """Spreads the requests of all the workers of a SQLiteWorkQueue so that
+    no more than `rate` requests per second are sent in total. Every request
+    books the next free slot in the database and waits for it.
+    """
+
+    def __init__(self, queue, rate, name='requests'):
+        self._queue = queue
+        self._interval = 1.0 / rate
+        self._name = name
+
+    def consume(self):
+        """Blocks until the next request of the workers can be sent."""
+        with self._queue._transaction() as connection:
+            row = connection.execute(
+                'SELECT next_slot FROM budgets WHERE name = ?',
+                (self._name,)).fetchone()
+            now = time.time()
+            slot = max(now, row[0]) if row else now
+            connection.execute(
+                'INSERT OR REPLACE INTO budgets (name, next_slot) '
+                'VALUES (?, ?)', (self._name, slot + self._interval))
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _Transaction():
+    """Context manager of a BEGIN IMMEDIATE transaction on a connection in
+    autocommit mode, committed if its block succeeds.
+    """
+
+    def __init__(self, connection, lock):
+        self._connection = connection
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            self._connection.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._lock.release()
+            raise
+        return self._connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._connection.execute('COMMIT')
+            else:
+                self._connection.execute('ROLLBACK')
+        finally:
+            self._lock.release()
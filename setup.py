@@ -6,7 +6,7 @@ def readme():
 
 setup(name='elnortescrapper',
     version='1.0.0',
-    install_requires=['lxml','bs4', 'pandas'],
+    install_requires=['requests', 'lxml', 'pandas'],
     description='Web scrapper for El Norte Avisos de Ocasión real estate classified ads',
     url='http://github.com/rafrodrz/reformascrapper',
     keywords='elnorte avisos ocasion venta casas anuncios',
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import requests
+
+from elnortescrapper import Scrapper
+from elnortescrapper.parsers import VentaCasasParser
+
+
+def page(content, from_cache=False):
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = content
+    response.encoding = 'utf-8'
+    if from_cache:
+        response.from_cache = True
+    return response
+
+
+class CachedPageTest(unittest.TestCase):
+
+    def setUp(self):
+        path = os.path.join(tempfile.mkdtemp(), 'crawl.archive')
+        self.scrapper = Scrapper(archive_path=path)
+        self.archive = self.scrapper._archive
+
+    def test_cached_page_archived_once(self):
+        for _ in range(2):
+            self.scrapper._archive_page('http://h/ad/1',
+                                        page(b'1', from_cache=True), 'ad',
+                                        'venta_casas_cdmx')
+        self.assertIn('http://h/ad/1', self.archive)
+        self.assertEqual(len(self.archive.entries(latest=False)), 1)
+
+    def test_fetched_page_archived_again(self):
+        self.scrapper._archive_page('http://h/ad/1', page(b'1'), 'ad',
+                                    'venta_casas_cdmx')
+        self.scrapper._archive_page('http://h/ad/1', page(b'2'), 'ad',
+                                    'venta_casas_cdmx')
+        self.scrapper._archive_page('http://h/ad/1',
+                                    page(b'2', from_cache=True), 'ad',
+                                    'venta_casas_cdmx')
+        entries = self.archive.entries(latest=False)
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(self.archive.read(entries[-1]), b'2')
+
+
+class ParserOfTest(unittest.TestCase):
+
+    def test_parser_of_category(self):
+        scrapper = Scrapper()
+        parser = scrapper._parser_of('venta_casas_jalisco')
+        self.assertIsInstance(parser, VentaCasasParser)
+        self.assertIs(parser, scrapper._venta_casas_parser)
+
+
+if __name__ == '__main__':
+    unittest.main()
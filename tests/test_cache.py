@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+import requests
+
+from elnortescrapper import ResponseCache
+
+
+def response(content):
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = content
+    response.encoding = 'utf-8'
+    return response
+
+
+class EvictionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.directory, max_size=100000)
+        self.scans = 0
+        paths = self.cache._paths
+
+        def counted_paths():
+            self.scans += 1
+            return paths()
+        self.cache._paths = counted_paths
+
+    def test_evicts_down_to_low_water(self):
+        for i in range(1000):
+            self.cache.put('http://h/%d' % i, response(os.urandom(1000)))
+        size = sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory))
+        self.assertEqual(size, self.cache._size)
+        self.assertLessEqual(size, 100000)
+        # Every scan frees a tenth of the cache, not just one page
+        self.assertLess(self.scans, 100)
+
+    def test_keeps_recently_used_pages(self):
+        for i in range(1000):
+            self.cache.put('http://h/%d' % i, response(os.urandom(1000)))
+        self.assertIsNotNone(self.cache.get('http://h/999'))
+        self.assertIsNone(self.cache.get('http://h/0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import pandas as pd
+
+from elnortescrapper import clean_ads
+
+
+def ads(timestamps, **columns):
+    """DataFrame of ads scrapped at the given times, as strings."""
+    index = pd.Index(timestamps, name='timestamp')
+    return pd.DataFrame(columns, index=index)
+
+
+class PublicationDateTest(unittest.TestCase):
+
+    def test_leap_day_resolves_to_last_leap_year(self):
+        df = clean_ads(ads(['2026-03-01T10:00:00', '2024-03-01T10:00:00'],
+                           fecha_pub=[' 29 de febrero', ' 29 de febrero']))
+        self.assertEqual(list(df['fecha_pub']),
+                         [pd.Timestamp('2024-02-29'),
+                          pd.Timestamp('2024-02-29')])
+
+    def test_date_after_scrap_is_of_the_year_before(self):
+        df = clean_ads(ads(['2026-01-10T10:00:00'],
+                           fecha_pub=[' 20 de diciembre']))
+        self.assertEqual(df['fecha_pub'].iloc[0], pd.Timestamp('2025-12-20'))
+
+    def test_duplicate_timestamps(self):
+        df = clean_ads(ads(['2026-03-01T10:00:00', '2026-03-01T10:00:00',
+                            '2026-01-10T10:00:00'],
+                           fecha_pub=[' 5 de febrero', ' 20 de diciembre',
+                                      ' 20 de diciembre']))
+        self.assertEqual(list(df['fecha_pub']),
+                         [pd.Timestamp('2026-02-05'),
+                          pd.Timestamp('2025-12-20'),
+                          pd.Timestamp('2025-12-20')])
+        self.assertTrue(df.index.equals(pd.to_datetime(pd.Index(
+            ['2026-03-01T10:00:00', '2026-03-01T10:00:00',
+             '2026-01-10T10:00:00']))))
+
+
+class NumericColumnsTest(unittest.TestCase):
+
+    def test_values_out_of_range_are_missing(self):
+        df = clean_ads(ads(['2026-03-01T10:00:00'] * 3,
+                           recámaras=['200', '3', '2.5'],
+                           visitas=['1,234', '99,999,999,999', None]))
+        self.assertEqual(str(df['recámaras'].dtype), 'Int8')
+        self.assertEqual(df['recámaras'].isna().tolist(),
+                         [True, False, True])
+        self.assertEqual(df['recámaras'].iloc[1], 3)
+        self.assertEqual(df['visitas'].iloc[0], 1234)
+        self.assertTrue(pd.isna(df['visitas'].iloc[1]))
+        self.assertTrue(pd.isna(df['visitas'].iloc[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
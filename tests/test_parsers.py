@@ -0,0 +1,52 @@
+import random
+import re
+import unittest
+
+from elnortescrapper.parsers import (VentaCasasParser,
+                                     VentaDepartamentosParser,
+                                     VentaTerrenosParser)
+
+# Pieces of ads, including the separators the numeric fields start with
+PIECES = ['1', '2', '.', ',', ' ', ' visitas', ' Baño', ' Planta',
+          ' Recámara', 'm² de Terreno', 'm² de Construcción', '$',
+          ' pesos', 'ZONA: ', 'COLONIA: ', 'Publicado el', ' 3 de mayo',
+          '\n', 'x']
+
+
+def search_fields(parser, text):
+    """Searches every pattern of the parser on its own."""
+    fields = {}
+    for field, pattern in zip(parser._fields, parser.patterns):
+        match = re.search(pattern, text)
+        fields[field] = match.group(field) if match else None
+    return fields
+
+
+class LeftmostMatchTest(unittest.TestCase):
+    """Every field gets the value of the leftmost match of its pattern."""
+
+    parsers = (VentaCasasParser(), VentaDepartamentosParser(),
+               VentaTerrenosParser())
+
+    def assertParsedAsSearched(self, text):
+        for parser in self.parsers:
+            record = parser.parse({'text': text})
+            self.assertEqual({field: record[field]
+                              for field in parser._fields},
+                             search_fields(parser, text), repr(text))
+
+    def test_fields_starting_with_separators(self):
+        for text in [',. Baño', '.,5 visitas', '1.,2 visitas',
+                     ',.5m² de Terreno', '2,.3 Recámaras',
+                     '.5m² de Construcción']:
+            self.assertParsedAsSearched(text)
+
+    def test_overlapping_fields(self):
+        rng = random.Random(4)
+        for _ in range(2000):
+            self.assertParsedAsSearched(''.join(
+                rng.choice(PIECES) for _ in range(rng.randint(1, 30))))
+
+
+if __name__ == '__main__':
+    unittest.main()
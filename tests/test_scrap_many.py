@@ -0,0 +1,23 @@
+import unittest
+
+from elnortescrapper import Scrapper
+
+
+class UnusedTransport():
+    """Fails the test if any request is sent."""
+
+    def get(self, url, headers=None):
+        raise AssertionError('Unexpected request of %s' % url)
+
+
+class OptionsTest(unittest.TestCase):
+
+    def test_misspelled_option_fails_before_scraping(self):
+        scrapper = Scrapper(transport=UnusedTransport())
+        with self.assertRaises(TypeError):
+            scrapper.scrap_many(['venta_casas_cdmx', 'venta_casas_jalisco'],
+                                ad_limt=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import requests
+
+from elnortescrapper import Transport
+
+
+class FlakySession():
+    """Raises the given errors on the first requests, then answers 200."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = b'<html></html>'
+        return response
+
+
+class RetryTest(unittest.TestCase):
+
+    def transport(self, *errors):
+        transport = Transport(backoff_base=0, max_attempts=3)
+        transport._session = FlakySession(*errors)
+        return transport
+
+    def test_truncated_body_is_retried(self):
+        transport = self.transport(
+            requests.exceptions.ChunkedEncodingError('truncated'))
+        self.assertEqual(transport.get('http://h/').status_code, 200)
+        self.assertEqual(transport._session.calls, 2)
+
+    def test_garbled_body_is_retried(self):
+        transport = self.transport(
+            requests.exceptions.ContentDecodingError('garbled'))
+        self.assertEqual(transport.get('http://h/').status_code, 200)
+        self.assertEqual(transport._session.calls, 2)
+
+    def test_invalid_url_is_not_retried(self):
+        transport = self.transport(requests.exceptions.InvalidURL('bad'))
+        with self.assertRaises(requests.exceptions.InvalidURL):
+            transport.get('http://h/')
+        self.assertEqual(transport._session.calls, 1)
+
+    def test_retry_after_is_capped(self):
+        transport = Transport(backoff_max=5)
+        response = requests.models.Response()
+        response.status_code = 503
+        response.headers['Retry-After'] = '86400'
+        self.assertEqual(transport._backoff(0, response), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
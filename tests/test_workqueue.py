@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+
+import requests
+
+from elnortescrapper import Scrapper
+from elnortescrapper.workqueue import SQLiteWorkQueue, AD
+
+NO_ADS_PAGE = (b'<html><body><div id="celda_rut1">No se encontraron avisos'
+               b'</div></body></html>')
+
+
+class NoAdsTransport():
+    """Answers every request with the page past the last page of ads."""
+
+    def get(self, url, headers=None):
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = NO_ADS_PAGE
+        response.encoding = 'utf-8'
+        response.url = url
+        return response
+
+
+class ExpiredLeaseTest(unittest.TestCase):
+    """A worker whose lease expired can't change the task once another
+    worker leased it.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.queue = SQLiteWorkQueue(os.path.join(directory, 'queue.db'))
+        self.queue.put([(AD, 'venta_casas_cdmx', 'http://h/ad/1', None)])
+        self.stale = self.queue.lease('a', lease_seconds=0.01)
+        time.sleep(0.05)
+        self.current = self.queue.lease('b')
+
+    def tearDown(self):
+        self.queue.close()
+
+    def test_task_leased_again_after_expiry(self):
+        self.assertEqual(self.current.id, self.stale.id)
+        self.assertEqual(self.current.attempts, 2)
+
+    def test_stale_fail_after_completion(self):
+        self.assertTrue(self.queue.complete(self.current, {'precio': '1'}))
+        self.assertFalse(self.queue.fail(self.stale))
+        self.assertEqual(self.queue.counts()['done'], 1)
+        self.assertIsNone(self.queue.lease('c'))
+
+    def test_stale_complete_keeps_record(self):
+        self.assertTrue(self.queue.complete(self.current, {'precio': '2'}))
+        self.assertFalse(self.queue.complete(self.stale, {'precio': '1'}))
+        records = self.queue.records('venta_casas_cdmx')
+        self.assertEqual([dict(record) for record in records],
+                         [{'precio': '2'}])
+
+    def test_stale_complete_while_leased(self):
+        self.assertFalse(self.queue.complete(self.stale, {'precio': '1'}))
+        self.assertEqual(self.queue.counts()['leased'], 1)
+        self.assertTrue(self.queue.fail(self.current))
+        self.assertEqual(self.queue.counts()['pending'], 1)
+
+
+class CrashedWorkerTest(unittest.TestCase):
+    """An idle worker waits for the lease of a crashed worker to expire and
+    takes over its task, even past its idle_timeout.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.queue = SQLiteWorkQueue(os.path.join(directory, 'queue.db'))
+
+    def tearDown(self):
+        self.queue.close()
+
+    def test_listing_task_of_crashed_worker(self):
+        scrapper = Scrapper(transport=NoAdsTransport())
+        scrapper.seed(self.queue, 'venta_casas_cdmx')
+        self.assertIsNotNone(self.queue.lease('crashed', lease_seconds=0.5))
+        completed = scrapper.work(self.queue, idle_timeout=0.1,
+                                  poll_interval=0.05)
+        self.assertEqual(completed, 1)
+        self.assertEqual(self.queue.counts()['done'], 1)
+        self.assertEqual(self.queue.counts()['leased'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()